@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+import dnn
+import evolution
+import optimizers
+import simulation
+from genome import Genome
+from population import Population
+from constants import PIPES_X, BIRD_X, PIPE_SPACE, PIPE_SPEED
+
+DIMENSIONS = [2, 10, 10, 1]
+SIZES = [100, 1000, 10000, 100000]
+MUTATION_PROB = 0.1
+#Inputs of the networks of the optimizer benchmarks, the default ones without the speed are rarely solved
+OPTIMIZER_FEATURES = ('pipe_dx', 'pipe_dy', 'vy')
+#Modules imported by the headless training and the workers, numpy being the reference
+STARTUP_MODULES = ['numpy', 'dnn', 'simulation', 'islands', 'parallel', 'runtime', 'flappia']
+#Modules which must only be loaded by a rendering or reporting path
+HEAVY_MODULES = ('pygame', 'matplotlib', 'sklearn', 'tqdm')
+
+
+def measure(function, repeat=5, number=None, min_time=0.2):
+	"""
+	Return the best time of one call of function over repeat runs
+	If number is None, it is chosen so that a run lasts at least min_time
+	"""
+	if number is None:
+		number = 1
+		while True:
+			start = time.perf_counter()
+			for _ in range(number):
+				function()
+			if time.perf_counter() - start >= min_time:
+				break
+			number *= 2
+	best = float('inf')
+	for _ in range(repeat):
+		start = time.perf_counter()
+		for _ in range(number):
+			function()
+		best = min(best, (time.perf_counter() - start) / number)
+	return best
+
+
+def micro_benchmarks(rng):
+	"""
+	Benchmarks of the hot paths for one individual, and of the pipes update
+	Return a dict name -> {seconds, per_second}
+	"""
+	p1 = dnn.initialisation(DIMENSIONS, rng=rng)
+	p2 = dnn.initialisation(DIMENSIONS, rng=rng)
+	X = rng.standard_normal((2, 1))
+	sim = simulation.Simulation(1, simulation.individual_policy([p1]), course=simulation.make_course(rng))
+	cases = {
+		'dnn.forward_propagation': lambda: dnn.forward_propagation(X, p1),
+		'dnn.predict': lambda: dnn.predict(X, p1),
+		'dnn.procreate': lambda: dnn.procreate(p1, p2, MUTATION_PROB, rng),
+		'Simulation.move_pipes': lambda: sim.move_pipes(1),
+	}
+	results = {}
+	for name, function in cases.items():
+		seconds = measure(function)
+		results[name] = {'seconds': seconds, 'per_second': 1 / seconds}
+	return results
+
+
+def generation_benchmark(size, rng, max_frames, repeat, courses=1):
+	"""
+	Benchmark of one generation of size birds: headless simulation on courses seeded courses
+	played at once, then procreation of the next generation
+	Return a dict of the measures
+	"""
+	genome = Genome.random(DIMENSIONS, size, rng=rng)
+	children = Genome(DIMENSIONS, size)
+	course = simulation.make_course(rng, courses=courses)
+	best = None
+	for _ in range(repeat):
+		sim = simulation.Simulation(courses * size, simulation.batch_policy(genome.parameters, courses=courses),
+									course=course if courses > 1 else course[0])
+		start = time.perf_counter()
+		scores = sim.run_generation(max_frames)
+		simulate = time.perf_counter() - start
+
+		start = time.perf_counter()
+		evolution.buildGeneration(genome, simulation.fitness(scores, courses), children, rng)
+		evolve = time.perf_counter() - start
+
+		if best is None or simulate + evolve < best['simulate_seconds'] + best['evolve_seconds']:
+			best = {
+				'population': size,
+				'courses': courses,
+				'frames': sim.frame,
+				'decisions': int(scores.sum()),
+				'simulate_seconds': simulate,
+				'evolve_seconds': evolve,
+				'frames_per_second': sim.frame / simulate,
+				'decisions_per_second': int(scores.sum()) / simulate,
+				'generations_per_minute': 60 / (simulate + evolve),
+			}
+	return best
+
+
+def startup_benchmark(modules, repeat):
+	"""
+	Benchmark of the import of each module in a fresh interpreter, as done by every worker process
+	Return a dict name -> {seconds, heavy: the HEAVY_MODULES it loaded}
+	"""
+	results = {}
+	for name in modules:
+		code = (f"import sys, time; start = time.perf_counter(); import {name}; "
+				f"print(time.perf_counter() - start, *[m for m in {HEAVY_MODULES!r} if m in sys.modules])")
+		best, heavy = float('inf'), []
+		for _ in range(repeat):
+			output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+									cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+			best, heavy = min(best, float(output[0])), output[1:]
+		results[name] = {'seconds': best, 'heavy': heavy}
+	return results
+
+
+def optimizer_benchmark(name, size, rng, courses, target, max_generations):
+	"""
+	Evaluations needed by the optimizer name to solve the courses: a bird passing target pipes on each of them
+	Every optimizer plays the same courses with the same fitness, the mean score of a bird on the courses
+	Return a dict of the measures, generations and evaluations being None if it is not solved
+	"""
+	optimizer = optimizers.OPTIMIZERS[name]()
+	population = Population(size, [len(OPTIMIZER_FEATURES)] + DIMENSIONS[1:], courses=len(courses))
+	#Frames for the left side of the pipe target to pass the birds
+	max_frames = int((PIPES_X - BIRD_X + (target - 1) * PIPE_SPACE) / PIPE_SPEED) + 2
+	start = time.perf_counter()
+	solved, best = None, 0
+	for generation in range(1, max_generations + 1):
+		optimizer.ask(population.spare, rng)
+		population.swap()
+		scores, _ = simulation.evaluate(population.genome, courses, max_frames, population=population,
+										features=OPTIMIZER_FEATURES)
+		optimizer.tell(population.genome, scores)
+		best = max(best, scores.max())
+		#The birds reaching max_frames on every course passed the target on all of them
+		if best >= max_frames:
+			solved = generation
+			break
+	return {
+		'optimizer': name,
+		'population': size,
+		'courses': len(courses),
+		'target': target,
+		'generations': solved,
+		'evaluations': None if solved is None else solved * size * len(courses),
+		'best': float(best) / max_frames,
+		'seconds': time.perf_counter() - start,
+	}
+
+
+def commit():
+	"""
+	Return the current git commit, None outside of a repository
+	"""
+	try:
+		return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmarks of FlappyIA, headless')
+	parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='population sizes of the generation benchmarks')
+	parser.add_argument('--max-frames', type=int, default=1000, help='maximal number of frames of a generation')
+	parser.add_argument('--repeat', type=int, default=3, help='number of runs of each generation benchmark, the best is kept')
+	parser.add_argument('--seed', type=int, default=0, help='seed of the populations and courses')
+	parser.add_argument('--courses', type=int, default=1, help='number of courses played by each bird of a generation')
+	parser.add_argument('--output', default=None, help='JSON file receiving the results')
+	parser.add_argument('--optimizers', nargs='+', choices=sorted(optimizers.OPTIMIZERS), default=[],
+						help='optimizers compared on the evaluations needed to solve the benchmark courses')
+	parser.add_argument('--optimizer-population', type=int, default=1000, help='number of birds of the optimizers')
+	parser.add_argument('--target', type=int, default=10, help='pipes to pass on every course to solve them')
+	parser.add_argument('--max-generations', type=int, default=300, help='generations of an optimizer before giving up')
+	parser.add_argument('--max-startup', type=float, default=None,
+						help='fail if importing a module takes more seconds than numpy plus this budget')
+	args = parser.parse_args()
+
+	rng = np.random.default_rng(args.seed)
+	results = {
+		'commit': commit(),
+		'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'python': platform.python_version(),
+		'numpy': np.__version__,
+		'machine': platform.machine(),
+		'seed': args.seed,
+		'startup': startup_benchmark(STARTUP_MODULES, args.repeat),
+		'micro': micro_benchmarks(rng),
+		'generation': [generation_benchmark(size, rng, args.max_frames, args.repeat, args.courses) for size in args.sizes],
+	}
+	#The optimizers all play the same courses, from the same generator state
+	courses = simulation.make_course(np.random.default_rng(args.seed), courses=args.courses)
+	results['optimizers'] = [optimizer_benchmark(name, args.optimizer_population, np.random.default_rng(args.seed), courses,
+							args.target, args.max_generations) for name in args.optimizers]
+
+	for name, r in results['startup'].items():
+		print(f"import {name:21s} {r['seconds']*1e3:10.2f} ms  {' '.join(r['heavy'])}")
+	for name, r in results['micro'].items():
+		print(f"{name:28s} {r['seconds']*1e6:10.2f} us  {r['per_second']:14.0f} /s")
+	for r in results['generation']:
+		print(f"population {r['population']:7d} x {r['courses']} courses  {r['frames_per_second']:10.0f} frames/s  "
+			f"{r['decisions_per_second']:12.0f} decisions/s  {r['generations_per_minute']:8.1f} generations/min")
+	for r in results['optimizers']:
+		solved = (f"solved in {r['generations']:5d} generations {r['evaluations']:10d} evaluations"
+				if r['generations'] is not None else f"not solved, best {r['best']:.0%} of the target")
+		print(f"optimizer {r['optimizer']:6s} population {r['population']:6d} x {r['courses']} courses  {solved}  "
+			f"{r['seconds']:8.1f} s")
+	if args.output is not None:
+		with open(args.output, 'w') as f:
+			json.dump(results, f, indent=1)
+
+	#Guard of the startup: the headless modules only need numpy
+	reference = results['startup']['numpy']['seconds']
+	for name, r in results['startup'].items():
+		if r['heavy']:
+			parser.exit(1, f"import {name} loads {', '.join(r['heavy'])}\n")
+		if args.max_startup is not None and r['seconds'] > reference + args.max_startup:
+			parser.exit(1, f"import {name} takes {r['seconds']:.3f} s, more than numpy + {args.max_startup} s\n")
+
+
+if __name__ == "__main__":
+	main()
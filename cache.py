@@ -0,0 +1,76 @@
+from collections import OrderedDict
+import numpy as np
+
+#Odd multipliers of the genome hashes, fixed so that the hashes are the same from one run to another
+MULTIPLIERS = np.random.default_rng(0x5EED).integers(0, 2**63, size=(2, 1 << 12), dtype=np.uint64) * 2 + 1
+#Number of individuals hashed at once, so that their 64 bits words stay small with a million birds
+CHUNK = 1 << 14
+
+
+def genome_hashes(buffer, chunk=CHUNK):
+	"""
+	Return a 128 bits hash of the parameters of each individual of the buffer, shape (population, size),
+	as a list of tuples of two ints
+	The hash is a sum of the 32 bits words of the parameters times fixed random odd multipliers
+	"""
+	buffer = np.asarray(buffer)
+	multipliers = MULTIPLIERS[:, np.arange(buffer.shape[1] * buffer.itemsize // 4) % MULTIPLIERS.shape[1]]
+	hashes = []
+	for start in range(0, len(buffer), chunk):
+		words = np.ascontiguousarray(buffer[start:start + chunk]).view(np.uint32).astype(np.uint64)
+		#Integer products and sums wrap modulo 2^64
+		hashes.extend(map(tuple, (words @ multipliers.T).tolist()))
+	return hashes
+
+
+class FitnessCache:
+	"""
+	Class FitnessCache
+	Scores of genomes on seeded courses, with the number of pipes they passed, the least recently used are evicted
+	Attributs:
+		-> capacity : maximal number of scores kept
+		-> scores : OrderedDict (genome hash, course seed, settings) -> (score, pipes passed)
+		-> hits : number of scores found
+		-> misses : number of scores not found
+	"""
+
+	def __init__(self, capacity=10000):
+		"""
+		FitnessCache constructor
+		Parameters:
+			-> capacity : maximal number of scores kept
+		"""
+		self.capacity = capacity
+		self.scores = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def lookup(self, genome, course_seed, settings=()):
+		"""
+		Search the score of each individual of genome on the course of seed course_seed
+		settings must contain everything else changing the score (score cap, simulation mode, ...)
+		Return (keys, scores, pipes, found), scores and pipes being valid only where found is True
+		"""
+		keys = [(h, course_seed, settings) for h in genome_hashes(genome.buffer)]
+		scores = np.zeros(len(keys))
+		pipes = np.zeros(len(keys), dtype=np.int64)
+		found = np.zeros(len(keys), dtype=bool)
+		for i, key in enumerate(keys):
+			value = self.scores.get(key)
+			if value is not None:
+				self.scores.move_to_end(key)
+				scores[i], pipes[i] = value
+				found[i] = True
+		self.hits += int(found.sum())
+		self.misses += len(keys) - int(found.sum())
+		return keys, scores, pipes, found
+
+	def store(self, keys, scores, pipes):
+		"""
+		Store the score and the number of pipes passed of each key, evicting the least recently used ones
+		"""
+		for key, score, passed in zip(keys, scores, pipes):
+			self.scores[key] = (float(score), int(passed))
+			self.scores.move_to_end(key)
+		while len(self.scores) > self.capacity:
+			self.scores.popitem(last=False)
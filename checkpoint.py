@@ -0,0 +1,167 @@
+import os
+import glob
+import json
+import queue
+import threading
+import numpy as np
+import dnn
+from genome import Genome
+
+#Version of the checkpoint format, increased at each incompatible change
+CHECKPOINT_VERSION = 1
+
+
+def save(path, genome, scores, generation, rng_state, schedule=None, optimizer=None, islands=1, algorithm='ga',
+		features=None):
+	"""
+	Write a checkpoint atomically: the file is written aside then renamed
+	Parameters:
+		-> path : path of the .npz file
+		-> genome : genome.Genome of the population
+		-> scores : score of each bird
+		-> generation : number of the generation
+		-> rng_state : state of the bit generator of the run (rng.bit_generator.state)
+		-> schedule : state of the mutation schedule (see evolution.AdaptiveMutation.state), None without one
+		-> optimizer : dict of the arrays of the state of the optimizer (see optimizers), None without one
+		-> islands : number of islands of the population (see islands.IslandModel), rng_state being then
+			the list of the states of the islands
+		-> algorithm : name of the optimizer (see optimizers.OPTIMIZERS)
+		-> features : names of the inputs of the networks (see features.FEATURES), None if unknown
+	"""
+	optimizer = {} if optimizer is None else optimizer
+	tmp = path + '.tmp'
+	with open(tmp, 'wb') as f:
+		np.savez(f,
+				version=np.int64(CHECKPOINT_VERSION),
+				dimensions=np.array(genome.dimensions, dtype=np.int64),
+				activations=np.array(genome.model.activations),
+				buffer=genome.buffer,
+				scores=np.asarray(scores),
+				generation=np.int64(generation),
+				rng_state=np.array(json.dumps(rng_state)),
+				schedule=np.array(json.dumps(schedule)),
+				islands=np.int64(islands),
+				algorithm=np.array(algorithm),
+				features=np.array([] if features is None else list(features), dtype=str),
+				**{'optimizer_' + key: value for key, value in optimizer.items()})
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(tmp, path)
+
+
+def load(path):
+	"""
+	Read a checkpoint written by save
+	Return a dict with genome, scores, generation, rng_state, schedule, optimizer, islands, algorithm and features
+	"""
+	with np.load(path) as data:
+		version = int(data['version'])
+		if version != CHECKPOINT_VERSION:
+			raise ValueError(f"{path}: checkpoint version {version}, expected {CHECKPOINT_VERSION}")
+		buffer = data['buffer']
+		#The checkpoints written before the model specs only have sigmoid networks
+		activations = [str(a) for a in data['activations']] if 'activations' in data else None
+		model = dnn.ModelSpec(data['dimensions'], activations, buffer.dtype)
+		rng_state = json.loads(str(data['rng_state']))
+		optimizer = {key[len('optimizer_'):]: data[key] for key in data.files if key.startswith('optimizer_')}
+		return {'genome': Genome(model, buffer.shape[0] if buffer.ndim == 2 else None, buffer),
+				'scores': data['scores'],
+				'generation': int(data['generation']),
+				'rng_state': rng_state,
+				#The checkpoints written before the mutation schedules have none
+				'schedule': json.loads(str(data['schedule'])) if 'schedule' in data else None,
+				'optimizer': optimizer,
+				#The checkpoints written before the island count have a list of states with islands
+				'islands': int(data['islands']) if 'islands' in data else
+							len(rng_state) if isinstance(rng_state, list) else 1,
+				#The checkpoints written before the optimizer name are recognised from the state of their optimizer
+				'algorithm': str(data['algorithm']) if 'algorithm' in data else
+							'cmaes' if 'C' in optimizer else 'es' if 'm' in optimizer else 'ga',
+				#The checkpoints written before the feature names do not tell their inputs
+				'features': tuple(str(f) for f in data['features']) or None if 'features' in data else None}
+
+
+def latest(directory):
+	"""
+	Return the path of the last checkpoint of directory, None if there is none
+	"""
+	paths = sorted(glob.glob(os.path.join(directory, 'gen_*.npz')))
+	return paths[-1] if paths else None
+
+
+class Checkpointer:
+	"""
+	Class Checkpointer
+	Write checkpoints in a background thread so that the training loop is not blocked
+	Attributs:
+		-> directory : directory of the checkpoints, named gen_<generation>.npz
+		-> keep : number of checkpoints kept, the older ones are removed (never the ones of a later generation,
+			which belong to another run)
+		-> queue : snapshots waiting to be written (at most one)
+		-> thread : writing thread
+		-> error : exception of the last failed write, raised by the next submit or close
+	"""
+
+	def __init__(self, directory, keep=3):
+		"""
+		Checkpointer constructor
+		Parameters:
+			-> directory : directory of the checkpoints, created if needed
+			-> keep : number of checkpoints kept
+		"""
+		self.directory = directory
+		self.keep = keep
+		os.makedirs(directory, exist_ok=True)
+		self.queue = queue.Queue(maxsize=1)
+		self.error = None
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+
+	def submit(self, genome, scores, generation, rng_state, schedule=None, optimizer=None, islands=1, algorithm='ga',
+			features=None):
+		"""
+		Snapshot the state of the run and write it in the background
+		Wait only if the previous checkpoint is still being written
+		Raise the error of a previous write which failed
+		"""
+		self.check()
+		self.queue.put((genome.copy(), np.array(scores), generation, rng_state, schedule, optimizer, islands, algorithm,
+						features))
+
+	def run(self):
+		"""
+		Writing thread: write the snapshots until None is received
+		A failed write is kept for the training loop and the thread goes on,
+		so that submit and close never wait for a thread which is dead
+		"""
+		while True:
+			snapshot = self.queue.get()
+			if snapshot is None:
+				break
+			genome, scores, generation, rng_state, schedule, optimizer, islands, algorithm, features = snapshot
+			try:
+				path = os.path.join(self.directory, f"gen_{generation:08d}.npz")
+				save(path, genome, scores, generation, rng_state, schedule, optimizer, islands, algorithm, features)
+				older = [p for p in sorted(glob.glob(os.path.join(self.directory, 'gen_*.npz'))) if p <= path]
+				for p in older[:-self.keep]:
+					os.remove(p)
+			except Exception as error:
+				self.error = error
+			self.queue.task_done()
+
+	def check(self):
+		"""
+		Raise the error of the last failed write, once
+		"""
+		error, self.error = self.error, None
+		if error is not None:
+			raise error
+
+	def close(self):
+		"""
+		Wait for the pending checkpoint and stop the writing thread
+		Raise the error of the last write if it failed
+		"""
+		self.queue.put(None)
+		self.thread.join()
+		self.check()
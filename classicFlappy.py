@@ -132,7 +132,8 @@ class PipeGestionnary:
 	Class PipeGestionnary
 	Attributs:
 		-> nb : number of pipe
-		-> pipes : list containing all the pipes
+		-> pipes : list containing all the pipes, used as a ring buffer
+		-> first : index in pipes of the leftmost pipe
 	"""
 	
 	def __init__(self, x, nb):
@@ -148,20 +149,21 @@ class PipeGestionnary:
 						random.randint(PIPE_HEIGHT, screen.get_size()[1]-PIPE_HEIGHT),
 						PIPE_HEIGHT, PIPE_WIDTH)
 						for i in range(self.nb)]
+		self.first = 0
 	def update(self, move):
 		"""
 		Update the position of the all pipes using PIPE_SPEED constant
-		Sort pipes by increasing horizontal position
-		If one pipes disapear in the left side, it is replaced on the right
+		If the first pipe disapear in the left side, it is replaced on the right
+		and the next one becomes the first, so the pipes never need to be sorted
 		"""
 		for pipe in self.pipes:
 			if move:
 				pipe.x -= 1.5
 			pipe.update()
-		if self.pipes[0].x + self.pipes[0].l < 0:
-			self.pipes[0].x = self.pipes[self.nb-1].x + PIPE_SPACE
-			
-		self.pipes = sorted(self.pipes, key=lambda p: p.x)
+		first = self.pipes[self.first]
+		if first.x + first.l < 0:
+			first.x = self.pipes[self.first-1].x + PIPE_SPACE
+			self.first = (self.first + 1) % self.nb
 	
 
 
@@ -197,7 +199,7 @@ while True:
 		
 
 		#If bird touch a pipe -> dead
-		if bird.rect.colliderect(pipes.pipes[0].rect[0]) or bird.rect.colliderect(pipes.pipes[0].rect[1]):
+		if bird.rect.colliderect(pipes.pipes[pipes.first].rect[0]) or bird.rect.colliderect(pipes.pipes[pipes.first].rect[1]):
 			bird.alive = False
 		
 		#Score count -> searching the pipe where the bird is (okay it's not opti but don't juge)
@@ -0,0 +1,60 @@
+import numpy as np
+from constants import PIPE_WIDTH, PIPE_HEIGHT, BIRD_RADIUS
+
+
+def distances(x, y, pipes_x, pipes_y):
+	"""
+	Distance between the center of the birds and the closest solid part of each pipe
+	Parameters:
+		-> x : horizontal position of the birds
+		-> y : vertical position of the birds, shape (..., n)
+		-> pipes_x : horizontal position of the pipes, shape (..., k)
+		-> pipes_y : vertical position of the hole of the pipes, shape (..., k)
+	Return an array of shape (..., n, k)
+	"""
+	h = PIPE_HEIGHT / 2
+	pipes_x = np.asarray(pipes_x)[..., np.newaxis, :]
+	pipes_y = np.asarray(pipes_y)[..., np.newaxis, :]
+	y = np.asarray(y)[..., np.newaxis]
+	#Horizontal distance to the pipe, 0 if the center is in front of it
+	dx = np.maximum(np.maximum(pipes_x - x, x - pipes_x - PIPE_WIDTH), 0)
+	#Vertical distance to the closest lip, 0 if the center is outside the hole
+	dy = np.maximum(np.minimum(y - pipes_y + h, pipes_y + h - y), 0)
+	return np.hypot(dx, dy)
+
+
+def hits(x, y, pipes_x, pipes_y, radius=BIRD_RADIUS):
+	"""
+	Mask of the birds whose circle intersects a pipe
+	Only the pipes horizontally in range of the birds are tested
+	Parameters:
+		-> x : horizontal position of the birds
+		-> y : vertical position of the birds, shape (..., n)
+		-> pipes_x : horizontal position of the pipes, shape (k,)
+		-> pipes_y : vertical position of the hole of the pipes, shape (..., k)
+	Return a boolean array of shape (..., n)
+	"""
+	near = (pipes_x < x + radius) & (x - radius < pipes_x + PIPE_WIDTH)
+	if not near.any():
+		return np.zeros(np.shape(y), dtype=bool)
+	return (distances(x, y, pipes_x[near], pipes_y[..., near]) < radius).any(axis=-1)
+
+
+def first_hit(x, ys, pipes_x, pipes_y, radius=BIRD_RADIUS):
+	"""
+	Frame of the first collision of each bird along a trajectory
+	Parameters:
+		-> x : horizontal position of the birds
+		-> ys : vertical position of the birds at each frame, shape (T, n)
+		-> pipes_x : horizontal position of the pipes at each frame, shape (T, k)
+		-> pipes_y : vertical position of the hole of the pipes, shape (k,)
+	Return an int array of shape (n,), the index of the frame of death or -1
+	"""
+	near = ((pipes_x < x + radius) & (x - radius < pipes_x + PIPE_WIDTH)).any(axis=0)
+	frames = np.full(ys.shape[1], -1)
+	if not near.any():
+		return frames
+	hit = (distances(x, ys, pipes_x[:, near], pipes_y[near]) < radius).any(axis=-1)
+	dead = hit.any(axis=0)
+	frames[dead] = hit[:, dead].argmax(axis=0)
+	return frames
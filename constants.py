@@ -0,0 +1,17 @@
+#Game constants, shared by the simulation, the collisions and the display
+SCREEN_SIZE = (700, 500)
+PIPE_SPACE = 200
+PIPE_WIDTH = 50
+PIPE_HEIGHT = 90
+PIPE_SPEED = 1.5
+GRAVITY = 0.15
+
+#Bird constants
+BIRD_X = 100
+BIRD_MASS = 10
+BIRD_RADIUS = 10
+JUMP_FORCE = -40
+
+#Pipes constants
+PIPES_X = 300
+NB_PIPES = 5
@@ -1,18 +1,101 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.datasets import make_blobs, make_circles
-from sklearn.metrics import accuracy_score, log_loss
-from tqdm import tqdm
-import random
 
-def initialisation(dimensions):
-	parametres = {}
+#Number of individuals evaluated at once by batch_predict
+CHUNK = 1 << 14
+
+
+def sigmoid(Z):
+	"""
+	Sigmoid computed in place as 0.5 * tanh(Z / 2) + 0.5, which never overflows
+	"""
+	Z *= 0.5
+	np.tanh(Z, out=Z)
+	Z *= 0.5
+	Z += 0.5
+	return Z
+
+def tanh(Z):
+	"""
+	Hyperbolic tangent computed in place
+	"""
+	return np.tanh(Z, out=Z)
+
+def relu(Z):
+	"""
+	Rectified linear unit computed in place
+	"""
+	return np.maximum(Z, 0, out=Z)
+
+#Activations, computed in place on the pre-activation Z
+ACTIVATIONS = {'sigmoid': sigmoid, 'tanh': tanh, 'relu': relu}
+#Pre-activation of the output layer above which the output is >= 0.5,
+#so that a decision does not need the output activation
+THRESHOLDS = {'sigmoid': 0.0, 'tanh': float(np.arctanh(0.5)), 'relu': 0.5}
+
+
+class ModelSpec:
+	"""
+	Class ModelSpec
+	Description of a network shared by its initialisation, its inference and its genome
+	Attributs:
+		-> dimensions : number of neurons of each layer, the inputs first
+		-> activations : name of the activation of each layer but the inputs (see ACTIVATIONS)
+		-> dtype : type of the parameters and of the inference
+	"""
+
+	def __init__(self, dimensions, activations=None, dtype=np.float32):
+		"""
+		ModelSpec constructor
+		Parameters:
+			-> dimensions : number of neurons of each layer
+			-> activations : name of the activation of each layer, sigmoid everywhere if None
+			-> dtype : type of the parameters and of the inference
+		"""
+		self.dimensions = [int(d) for d in dimensions]
+		self.activations = ['sigmoid'] * (len(self.dimensions) - 1) if activations is None else list(activations)
+		self.dtype = np.dtype(dtype)
+		if len(self.activations) != len(self.dimensions) - 1:
+			raise ValueError(f"{len(self.activations)} activations for {len(self.dimensions) - 1} layers")
+		for name in self.activations:
+			if name not in ACTIVATIONS:
+				raise ValueError(f"unknown activation {name!r}, expected one of {sorted(ACTIVATIONS)}")
+
+	def __eq__(self, other):
+		return (isinstance(other, ModelSpec) and self.dimensions == other.dimensions
+				and self.activations == other.activations and self.dtype == other.dtype)
+
+	def __repr__(self):
+		return f"ModelSpec({self.dimensions}, {self.activations}, {self.dtype.name})"
+
+
+def as_model(model):
+	"""
+	Return model if it is a ModelSpec, else the default ModelSpec of the dimensions model
+	"""
+	return model if isinstance(model, ModelSpec) else ModelSpec(model)
+
+
+def initialisation(model, parametres=None, rng=None):
+	"""
+	Random parameters of a network drawn from rng (np.random.Generator)
+	model is a ModelSpec or the list of the dimensions of the network
+	If parametres is given (e.g. the views of a genome.Genome), it is filled in place,
+	a leading population axis being allowed
+	"""
+	rng = np.random.default_rng() if rng is None else rng
+	model = as_model(model)
+	dimensions = model.dimensions
 	C = len(dimensions)
-	np.random.seed()
 	
+	if parametres is not None:
+		for key, w in parametres.items():
+			w[...] = rng.standard_normal(w.shape)
+		return parametres
+	
+	parametres = {}
 	for c in range(1, C):
-		parametres['W' + str(c)] = np.random.randn(dimensions[c], dimensions[c - 1])
-		parametres['b' + str(c)] = np.random.randn(dimensions[c], 1)
+		parametres['W' + str(c)] = rng.standard_normal((dimensions[c], dimensions[c - 1]), dtype=model.dtype)
+		parametres['b' + str(c)] = rng.standard_normal((dimensions[c], 1), dtype=model.dtype)
 
 	return parametres
 	
@@ -32,43 +115,164 @@ def proba(x, y):
     
     return z
     
-def procreate(p1, p2, prob):
+def crossover(w1, w2, prob, rng, out, crossing=True, scale=None):
+	"""
+	Crossover and mutation of two tensors using a single random draw
+	Each element is taken from w2 with probability 1/2 if crossing, else kept from w1,
+	then mutates with probability prob: it is replaced by a uniform value in [-0.5, 0.5] if scale is None,
+	else perturbed by a gaussian noise of standard deviation scale
+	Result is written in out
+	"""
+	u = rng.random(out.shape)
+	np.copyto(out, w1)
+	if crossing:
+		np.copyto(out, w2, where=u >= (1 + prob) / 2)
+	if prob > 0 and scale is None:
+		#u / prob is uniform in [0, 1] when u <= prob
+		np.copyto(out, u / prob - 0.5, where=u <= prob)
+	elif prob > 0:
+		mutated = u <= prob
+		out[mutated] += scale * rng.standard_normal(np.count_nonzero(mutated), dtype=out.dtype)
+	return out
+
+def procreate(p1, p2, prob, rng=None, out=None, scale=None):
+	"""
+	Child of p1 and p2: weights are crossed, biases come from p2
+	Each value mutates with probability prob, see crossover for scale
+	If out is given (e.g. the views of a genome.Genome), the child is written in it
+	"""
+	rng = np.random.default_rng() if rng is None else rng
 	C = len(p1) // 2
 	
-	p = {}
+	p = {key: np.empty_like(w) for key, w in p1.items()} if out is None else out
 
 	for c in range(1, C + 1):
-		p['W' + str(c)] = np.copy(p1['W' + str(c)])
-		p['b' + str(c)] = np.copy(p2['b' + str(c)])
-		
-		for i in range(p['W' + str(c)].shape[0]):
-			for j in range(p['W' + str(c)].shape[1]):
-				if(random.random() <= prob):
-					p['W' + str(c)][i][j] = random.uniform(-0.5, 0.5)
-				elif random.random() >= 0.5:
-					p['W' + str(c)][i][j] = p2['W' + str(c)][i][j]
-		for i in range(p['b' + str(c)].shape[0]):
-			for j in range(p['b' + str(c)].shape[1]):
-				if(random.random() <= prob):
-					p['b' + str(c)][i][j] = random.uniform(-0.5, 0.5)
-				elif random.random() >= 0.5:
-					p['b' + str(c)][i][j] = p2['b' + str(c)][i][j]
+		W, b = 'W' + str(c), 'b' + str(c)
+		crossover(p1[W], p2[W], prob, rng, p[W], scale=scale)
+		crossover(p2[b], None, prob, rng, p[b], False, scale)
 	return p
 
-def forward_propagation(X, parametres):
-	activations = {'A0': X}
+def batch_procreate(parametres, p1, p2, prob, rng=None, out=None, scale=None, chunk=CHUNK):
+	"""
+	Children of a whole population in one call, same rules as procreate
+	Parameters:
+		-> parametres : stacked parameters of the parents (see stack_parameters)
+		-> p1, p2 : index of the parents of each child, shape (children,)
+		-> prob : mutation probability
+		-> rng : np.random.Generator
+		-> out : preallocated stacked parameters receiving the children,
+			it must not share memory with parametres
+		-> scale : standard deviation of the gaussian mutations, None for uniform replacements (see crossover)
+		-> chunk : number of children of a tensor bred at once, so that the gathered parents
+			and the random draws stay small with a million birds
+	Return the stacked parameters of the children
+	"""
+	rng = np.random.default_rng() if rng is None else rng
+	C = len(parametres) // 2
+	
+	if out is None:
+		out = {key: np.empty((len(p1),) + w.shape[1:], dtype=w.dtype) for key, w in parametres.items()}
 
+	for c in range(1, C + 1):
+		W, b = 'W' + str(c), 'b' + str(c)
+		for start in range(0, len(p1), chunk):
+			part = slice(start, start + chunk)
+			crossover(parametres[W][p1[part]], parametres[W][p2[part]], prob, rng, out[W][part], scale=scale)
+		for start in range(0, len(p1), chunk):
+			part = slice(start, start + chunk)
+			crossover(parametres[b][p2[part]], None, prob, rng, out[b][part], False, scale)
+	return out
+
+def forward_propagation(X, parametres, functions=None):
+	"""
+	Activations of every layer, in the type of the parameters
+	functions is the list of the activations of the layers (see ModelSpec), sigmoid if None
+	"""
 	C = len(parametres) // 2
+	functions = ['sigmoid'] * C if functions is None else functions
+	activations = {'A0': X.astype(parametres['W1'].dtype, copy=False)}
 
 	for c in range(1, C + 1):
 		Z = parametres['W' + str(c)].dot(activations['A' + str(c - 1)]) + parametres['b' + str(c)]
-		activations['A' + str(c)] = 1 / (1 + np.exp(-Z))
+		activations['A' + str(c)] = ACTIVATIONS[functions[c - 1]](Z)
 
 	return activations
 
-def predict(X, parametres):
-	activations = forward_propagation(X, parametres)
+def predict(X, parametres, functions=None):
+	"""
+	Decision (output >= 0.5) of a network, keeping only the current layer
+	The output activation is not computed, its pre-activation is compared to THRESHOLDS
+	"""
+	C = len(parametres) // 2
+	functions = ['sigmoid'] * C if functions is None else functions
+	A = X.astype(parametres['W1'].dtype, copy=False)
+
+	for c in range(1, C + 1):
+		Z = parametres['W' + str(c)].dot(A) + parametres['b' + str(c)]
+		if c == C:
+			return Z >= THRESHOLDS[functions[-1]]
+		A = ACTIVATIONS[functions[c - 1]](Z)
+
+
+def stack_parameters(parametres_list):
+	"""
+	Stack the parameters of a whole population into 3-D tensors
+	parametres['W' + str(c)] has the shape (population, out, in)
+	and parametres['b' + str(c)] the shape (population, out, 1)
+	"""
+	C = len(parametres_list[0]) // 2
+	parametres = {}
+
+	for c in range(1, C + 1):
+		parametres['W' + str(c)] = np.stack([p['W' + str(c)] for p in parametres_list])
+		parametres['b' + str(c)] = np.stack([p['b' + str(c)] for p in parametres_list])
+
+	return parametres
+
+def batch_forward_propagation(X, parametres, index=None, functions=None, decide=False, courses=1):
+	"""
+	Forward propagation of a whole population at once, one matmul per layer,
+	in the type of the parameters
+	X has the shape (in, courses * population), the column k * population + i being
+	the input of the individual i on the course k, so that each individual evaluates
+	its courses columns with a single matmul
+	If index (array or slice) is given, only the individuals of index are evaluated
+	functions is the list of the activations of the layers (see ModelSpec), sigmoid if None
+	Return the output layer, shape (population, out, courses), or the decisions (output >= 0.5) if decide
+	"""
 	C = len(parametres) // 2
-	Af = activations['A' + str(C)]
-	return Af >= 0.5
+	functions = ['sigmoid'] * C if functions is None else functions
+	index = slice(None) if index is None else index
+	A = X.reshape(len(X), courses, -1).transpose(2, 0, 1)[index].astype(parametres['W1'].dtype)
+
+	for c in range(1, C + 1):
+		W = parametres['W' + str(c)][index]
+		b = parametres['b' + str(c)][index]
+		Z = np.matmul(W, A)
+		Z += b
+		if decide and c == C:
+			return Z >= THRESHOLDS[functions[-1]]
+		A = ACTIVATIONS[functions[c - 1]](Z)
+
+	return A
 
+def batch_predict(X, parametres, alive=None, chunk=CHUNK, functions=None, courses=1):
+	"""
+	Decision of a whole population, same result as predict for each individual
+	The individuals are evaluated by chunks so that the temporary arrays stay small,
+	a chunk of consecutive living individuals uses views instead of copies of their parameters
+	functions is the list of the activations of the layers (see ModelSpec), sigmoid if None
+	With courses > 1, each individual plays several courses (see batch_forward_propagation)
+	Return a boolean mask of shape (courses * population,), False for the individuals not alive
+	"""
+	n = X.shape[1] // courses
+	#An individual is evaluated if it is alive on one of its courses
+	index = np.arange(n) if alive is None else np.flatnonzero(alive.reshape(courses, n).any(axis=0))
+	mask = np.zeros((courses, n), dtype=bool)
+	for start in range(0, len(index), chunk):
+		part = index[start:start + chunk]
+		if part[-1] - part[0] + 1 == len(part):
+			part = slice(part[0], part[-1] + 1)
+		mask[:, part] = batch_forward_propagation(X, parametres, part, functions, True, courses)[:, 0, :].T
+	mask = mask.reshape(-1)
+	return mask if alive is None else mask & alive
@@ -0,0 +1,184 @@
+import numpy as np
+import dnn
+import stats
+from genome import Genome
+
+ELITES = 5
+MUTATION_PROB = 0.1
+#Standard deviation of the gaussian mutations of the adaptive schedule at the start of a run
+MUTATION_SCALE = 0.1
+
+
+def top(scores, k):
+	"""
+	Return the indices of the k best scores, best first, in O(n + k log k)
+	"""
+	if k <= 0:
+		return np.zeros(0, dtype=np.int64)
+	best = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+	return best[np.argsort(-scores[best], kind='stable')]
+
+
+def truncation(scores, n, rng, k=5):
+	"""
+	Truncation selection: the parents are drawn uniformly among the k best birds
+	The first k children come from a single parent, the others from two distinct parents
+	Return the two parents of each of the n children
+	"""
+	best = top(scores, k)
+	p1 = rng.integers(0, k, n)
+	p2 = p1.copy()
+	p2[k:] = (p1[k:] + rng.integers(1, k, max(n - k, 0))) % k
+	return best[p1], best[p2]
+
+
+def tournament(scores, n, rng, size=3):
+	"""
+	Tournament selection: each parent is the best of size birds drawn uniformly
+	Return the two parents of each of the n children
+	"""
+	contestants = rng.integers(0, len(scores), (2, n, size))
+	winners = np.take_along_axis(contestants, scores[contestants].argmax(axis=-1)[..., np.newaxis], axis=-1)[..., 0]
+	return winners[0], winners[1]
+
+
+def proportional(weights, n, rng):
+	"""
+	Draw the two parents of each of the n children with a probability proportional to weights,
+	by a binary search in their cumulative sum, uniformly if they are all 0
+	"""
+	cumulative = np.cumsum(weights, dtype=np.float64)
+	if cumulative[-1] <= 0:
+		cumulative = np.arange(1, len(weights) + 1, dtype=np.float64)
+	parents = np.searchsorted(cumulative, rng.random((2, n)) * cumulative[-1], side='right')
+	parents = np.minimum(parents, len(weights) - 1)
+	return parents[0], parents[1]
+
+
+def rank(scores, n, rng):
+	"""
+	Rank-based selection: the probability of a bird is proportional to its rank, 1 for the worst
+	Return the two parents of each of the n children
+	"""
+	ranks = np.empty(len(scores))
+	ranks[np.argsort(scores, kind='stable')] = np.arange(1, len(scores) + 1)
+	return proportional(ranks, n, rng)
+
+
+def roulette(scores, n, rng):
+	"""
+	Fitness proportional (roulette wheel) selection on the scores
+	Return the two parents of each of the n children
+	"""
+	return proportional(np.maximum(scores, 0), n, rng)
+
+
+#Selection strategies: function (scores, n, rng) -> parents p1, p2 of the n children
+SELECTIONS = {'truncation': truncation, 'tournament': tournament, 'rank': rank, 'roulette': roulette}
+
+
+def buildGeneration(genome=None, scores=None, out=None, rng=None, elites=ELITES, mutation_prob=MUTATION_PROB,
+					selection=truncation, mutation_scale=None, schedule=None):
+	"""
+	Build the genome of the next generation
+	The elites best birds are kept, the other birds are children of parents chosen by selection
+	Parameters:
+		-> genome : genome.Genome of the last generation (None for the first one)
+		-> scores : score of each bird of the last generation
+		-> out : preallocated genome.Genome receiving the new generation, required for the first one
+		-> rng : np.random.Generator used for the initialisation, the selection and the procreation
+		-> elites : number of best birds copied unchanged, first in out
+		-> mutation_prob : probability of mutation of each parameter of a child
+		-> selection : function (scores, n, rng) -> parents p1, p2 of the n children, see SELECTIONS
+		-> mutation_scale : standard deviation of the gaussian mutations, None to replace the mutated
+			parameters by uniform values (see dnn.crossover)
+		-> schedule : function (genome, scores) -> (mutation_prob, mutation_scale) called at each generation,
+			overriding them (see AdaptiveMutation)
+	"""
+	rng = np.random.default_rng() if rng is None else rng
+	if out is None:
+		out = Genome(genome.model, genome.population)
+	if genome is None:
+		dnn.initialisation(out.model, out.parameters, rng)
+		return out
+
+	scores = np.asarray(scores)
+	if schedule is not None:
+		mutation_prob, mutation_scale = schedule(genome, scores)
+	out.buffer[:elites] = genome.buffer[top(scores, elites)]
+	nbChildren = out.population - elites
+	p1, p2 = selection(scores, nbChildren, rng)
+	children = Genome(out.model, nbChildren, out.buffer[elites:])
+	dnn.batch_procreate(genome.parameters, p1, p2, mutation_prob, rng, children.parameters, mutation_scale)
+	return out
+
+
+class AdaptiveMutation:
+	"""
+	Class AdaptiveMutation
+	Schedule of the mutations (see buildGeneration), adapted at each generation:
+	-> while the fitness improves, the mutations shrink by decay to refine the best birds
+	-> after patience generations without improvement, they grow by boost to explore again
+	-> when the diversity of the population falls under min_diversity, the scale is raised to it
+	The fitness signal is the mean of the best decile, smoothed since the courses change at each generation
+	Attributs:
+		-> prob, scale : current probability and standard deviation of the gaussian mutations
+		-> min_prob, max_prob, min_scale, max_scale : bounds of prob and scale
+		-> patience : number of generations without improvement before a boost
+		-> boost, decay : factors applied to prob and scale after a stagnation and an improvement
+		-> min_diversity : diversity (see stats.diversity) under which the population is considered collapsed
+		-> smoothing : weight of the past in the fitness signal
+		-> tolerance : relative increase of the signal counted as an improvement
+		-> signal : smoothed fitness signal, None before the first generation
+		-> best : best value of signal
+		-> stagnation : number of generations since the last improvement
+	"""
+
+	def __init__(self, prob=MUTATION_PROB, scale=MUTATION_SCALE, min_prob=0.01, max_prob=0.5, min_scale=0.01,
+				max_scale=1.0, patience=10, boost=1.5, decay=0.95, min_diversity=0.05, smoothing=0.7, tolerance=0.01):
+		"""
+		AdaptiveMutation constructor, prob and scale are the values at the start of the run
+		"""
+		self.prob, self.scale = prob, scale
+		self.min_prob, self.max_prob = min_prob, max_prob
+		self.min_scale, self.max_scale = min_scale, max_scale
+		self.patience = patience
+		self.boost, self.decay = boost, decay
+		self.min_diversity = min_diversity
+		self.smoothing = smoothing
+		self.tolerance = tolerance
+		self.signal, self.best, self.stagnation = None, None, 0
+
+	def __call__(self, genome, scores):
+		"""
+		Update the schedule from the last generation
+		Return the mutation probability and scale of the next one
+		"""
+		decile = max(len(scores) // 10, 1)
+		signal = float(np.partition(scores, len(scores) - decile)[-decile:].mean())
+		self.signal = signal if self.signal is None else self.smoothing * self.signal + (1 - self.smoothing) * signal
+		if self.best is None or self.signal > self.best * (1 + self.tolerance):
+			self.best, self.stagnation = self.signal, 0
+			factor = self.decay
+		else:
+			self.stagnation += 1
+			factor = self.boost if self.stagnation % self.patience == 0 else 1
+		self.prob = min(max(self.prob * factor, self.min_prob), self.max_prob)
+		self.scale = min(max(self.scale * factor, self.min_scale), self.max_scale)
+		if stats.diversity(genome.buffer) < self.min_diversity:
+			self.scale = max(self.scale, self.min_diversity)
+		return self.prob, self.scale
+
+	def state(self):
+		"""
+		Return the current state of the schedule, a JSON serialisable dict
+		"""
+		return {'prob': self.prob, 'scale': self.scale, 'signal': self.signal, 'best': self.best,
+				'stagnation': self.stagnation}
+
+	def restore(self, state):
+		"""
+		Restore a state returned by state
+		"""
+		self.prob, self.scale = state['prob'], state['scale']
+		self.signal, self.best, self.stagnation = state['signal'], state['best'], state['stagnation']
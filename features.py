@@ -0,0 +1,108 @@
+import numpy as np
+from constants import SCREEN_SIZE, PIPE_WIDTH, PIPE_HEIGHT
+
+#Vertical speed giving a feature of 1
+VY_SCALE = 10
+
+
+def pipe_dx(sim, pipe, out):
+	"""
+	Horizontal distance from the birds to the middle of the pipe
+	"""
+	out[...] = (sim.pipes_x[pipe] + PIPE_WIDTH//2 - sim.x) / SCREEN_SIZE[0]
+
+def by_course(sim, pipe, out):
+	"""
+	Return the hole of the pipe on each course, shape (courses, 1),
+	and the views of sim.y and out of shape (courses, birds of a course)
+	"""
+	hole = sim.pipes_y.reshape(sim.courses, -1)[:, pipe, np.newaxis]
+	return hole, sim.y.reshape(sim.courses, -1), out.reshape(sim.courses, -1)
+
+def pipe_dy(sim, pipe, out):
+	"""
+	Vertical distance from the birds to the middle of the hole of the pipe
+	"""
+	hole, y, view = by_course(sim, pipe, out)
+	np.subtract(hole, y, out=view)
+	out /= SCREEN_SIZE[1]
+
+def top_lip(sim, pipe, out):
+	"""
+	Vertical distance from the upper lip of the hole of the pipe to the birds
+	"""
+	hole, y, view = by_course(sim, pipe, out)
+	np.subtract(y, hole - PIPE_HEIGHT / 2, out=view)
+	out /= SCREEN_SIZE[1]
+
+def bottom_lip(sim, pipe, out):
+	"""
+	Vertical distance from the birds to the lower lip of the hole of the pipe
+	"""
+	hole, y, view = by_course(sim, pipe, out)
+	np.subtract(hole + PIPE_HEIGHT / 2, y, out=view)
+	out /= SCREEN_SIZE[1]
+
+def vy(sim, pipe, out):
+	"""
+	Vertical speed of the birds
+	"""
+	np.divide(sim.vy, VY_SCALE, out=out)
+
+def height(sim, pipe, out):
+	"""
+	Vertical position of the birds, 0 at the ceiling and 1 at the floor
+	"""
+	np.divide(sim.y, SCREEN_SIZE[1], out=out)
+
+
+#Features: name -> (pipe used, 0 for the next one and 1 for the one after, function (sim, pipe, out))
+FEATURES = {
+	'pipe_dx': (0, pipe_dx),
+	'pipe_dy': (0, pipe_dy),
+	'top_lip': (0, top_lip),
+	'bottom_lip': (0, bottom_lip),
+	'pipe2_dx': (1, pipe_dx),
+	'pipe2_dy': (1, pipe_dy),
+	'vy': (0, vy),
+	'height': (0, height),
+}
+#Inputs of the original networks
+DEFAULT_FEATURES = ('pipe_dx', 'pipe_dy')
+
+
+class FeatureExtractor:
+	"""
+	Class FeatureExtractor
+	Observation vector of a whole population, written in a preallocated (features, n) array
+	which is given as is to the batched inference
+	Attributs:
+		-> names : names of the features, in the order of the rows (see FEATURES)
+		-> X : preallocated observations, shape (features, n)
+	"""
+
+	def __init__(self, names, n):
+		"""
+		FeatureExtractor constructor
+		Parameters:
+			-> names : names of the features
+			-> n : number of birds
+		"""
+		for name in names:
+			if name not in FEATURES:
+				raise ValueError(f"unknown feature {name!r}, expected one of {sorted(FEATURES)}")
+		self.names = tuple(names)
+		self.X = np.empty((len(self.names), n))
+
+	def __call__(self, sim):
+		"""
+		Compute the features of all the birds of sim, return X
+		"""
+		pipes = sim.pipes
+		first = pipes.next()
+		#Without a pipe after the next one, the next one is seen twice
+		second = (first + 1) % pipes.capacity if pipes.ahead + 1 < pipes.capacity else first
+		for row, name in enumerate(self.names):
+			pipe, function = FEATURES[name]
+			function(sim, second if pipe else first, self.X[row])
+		return self.X
@@ -1,280 +1,411 @@
-import pygame
+import argparse
+import functools
 import math
-import random
 import dnn
 import numpy as np
-import chainedList
+import simulation
+import checkpoint
+import islands
+import features
+import instrumentation
+import stats
+import runtime
+import evolution
+import optimizers
+from population import Population
+from parallel import ParallelEvaluator
+from cache import FitnessCache
+from viewer import Spectator
+from constants import SCREEN_SIZE, PIPE_WIDTH, PIPE_HEIGHT, BIRD_RADIUS
 
-#Initialisation of pygame
-pygame.init()
-clock = pygame.time.Clock()
-
-#Random init
-random.seed()
-
-#Visual Constants
-SCREEN_SIZE = (700, 500)
 #Colors
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 GREEN = (0, 255, 0)
-#Font
-FONT = pygame.font.Font(None, 36)
-
-#Game constants
-PIPE_SPACE = 200
-PIPE_WIDTH = 50
-PIPE_HEIGHT = 90
-PIPE_SPEED = 1.5
-GRAVITY = 0.15
 
 #Execution speed
 FPS = 60
 NB_INDIVIDUAL = 1000
 ELITE_PERCENTAGE = 1
-MUTATION_PROB = 0.1
+DIMENSIONS = [2, 10, 10, 1]
 
-class Bird:
+class Renderer:
 	"""
-	Class Bird
+	Class Renderer
+	Optional observer of a simulation.Simulation drawing it with pygame
 	Attributs:
-		-> x : horizontal position
-		-> y : vertical position
-		-> mass : mass of the bird
-		-> vy : vertical speed
-		-> alive : state of the bird (true = alive, false = dead)
-		-> rect : visual pygame element of bird
+		-> screen : pygame display
+		-> clock : pygame clock limiting the display to FPS
+		-> font : font of the score
+		-> instruments : instrumentation.Instrumentation timing the event polling and the rendering
 	"""
 	
-	def __init__(self, x, y, mass, init_param=True):
+	def __init__(self, instruments=instrumentation.DISABLED):
 		"""
-		Bird constructor
-		Parameters:
-			-> x : horizontal initial position
-			-> y : vertical initial position
-			-> mass : mass of the bird
+		Renderer constructor
+		Init pygame and open the display
+		pygame is only imported here, so that the headless training never loads it
 		"""
-		
-		self.score = 0
-		self.x = x
-		self.y = y
-		self.mass = mass
-		self.vy = 0
-		self.alive = True
-		self.rect = pygame.draw.circle(screen, BLACK, (int(self.x), int(self.y)), 10)
-		self.parameters = dnn.initialisation([2, 10, 10, 1]) if init_param else None
-		
-	def reset(self):
-		self.score = 0
-		self.x = 100
-		self.y = screen.get_size()[1]//2
-		self.vy = 0
-		self.alive = True
-		self.rect = pygame.draw.circle(screen, BLACK, (int(self.x), int(self.y)), 10)
+		import pygame
 
-	def apply_force(self, fy):
-		"""
-		Apply a vertical force with a magnitude of fy to the bird
-		Update self.vy consequently		
-		"""
-		self.vy += fy / self.mass
+		self.instruments = instruments
+		pygame.init()
+		self.clock = pygame.time.Clock()
+		self.screen = pygame.display.set_mode(SCREEN_SIZE)
+		pygame.display.set_caption('FlappyIA')
+		self.font = pygame.font.Font(None, 36)
 		
-	def jump(self):
+	def __call__(self, sim):
 		"""
-		Use apply_force to make jump the Bird
+		Draw the pipes, the living birds and the score of sim
 		"""
-		if self.alive:
-			self.vy = 0
-			self.apply_force(-40)
-			
-	def makeDecision(self, next_pipe):
-		X = np.array([(next_pipe.x+PIPE_WIDTH//2-self.x)/SCREEN_SIZE[0], (next_pipe.y-self.y)/SCREEN_SIZE[1]], ndmin=2).reshape(-1, 1)
-		if dnn.predict(X, self.parameters):
-			self.jump()
+		import pygame
 
-	def update(self):
-		"""
-		Update the position, speed and display of the Bird
-		Apply gravity and limit the vertical position (set self.alive to False if the ground or the ceiling is touched
-		"""
-		self.rect = pygame.draw.circle(screen, BLACK, (int(self.x), int(self.y)), 10)
-		self.vy += GRAVITY
-		self.y += self.vy
-		if self.y <= 0:
-			self.y = 0
-			self.vy = 0
-			self.alive = False
-		if self.y >= SCREEN_SIZE[1]:
-			self.y = SCREEN_SIZE[1]
-			self.vy = 0
-			self.alive = False
+		#Event gestion
+		with self.instruments.phase('events'):
+			for event in pygame.event.get():
+				#If display closed
+				if event.type == pygame.QUIT:
+					pygame.quit()
+					quit()
+		
+		with self.instruments.phase('rendering'):
+			#Clear screen
+			self.screen.fill(WHITE)
+			
+			h = PIPE_HEIGHT / 2
+			for x, y in zip(sim.pipes_x, sim.pipes_y):
+				pygame.draw.rect(self.screen, GREEN, (x, 0, PIPE_WIDTH, y-h))
+				pygame.draw.rect(self.screen, GREEN, (x, y+h, PIPE_WIDTH, SCREEN_SIZE[1]-y+h))
+			for y in sim.y[sim.alive]:
+				pygame.draw.circle(self.screen, BLACK, (int(sim.x), int(y)), BIRD_RADIUS)
 			
-class Pipe:
+			#Score display
+			text_score = self.font.render("Score : " + str(sim.game_score), True, (255, 0, 0))
+			self.screen.blit(text_score, (20, 20))
+			
+			#Refresh display
+			pygame.display.update()
+		
+		self.clock.tick(FPS)
+
+		
+def exportChampion(path, completed, features):
 	"""
-	Class Pipe
-	Attributs:
-		-> x : horizontal position
-		-> y : vertical position of the hole
-		-> h : vertical dimension of the hole
-		-> l : width of the pipe
-		-> rect : tuple (r1, r2) where r1 and r2 are the upper and the lower visual parts of the pipe
+	Export the best bird of the last completed generation to path (see runtime.export)
 	"""
-	
-	def __init__(self, x, y, h, l):
-		"""
-		Pipe constructor
-		Parameters:
-			-> x : horizontal position of the pipe
-			-> y : vertical position of the hole
-			-> h : vertical dimension of the hole
-			-> l : width of the pipe
-		Init self.rect using those parameters
-		"""
-		self.x = x
-		self.y = y
-		self.h = h/2
-		self.l = l
-		r1 = pygame.draw.rect(screen, GREEN, (self.x, 0, self.l, self.y-self.h))
-		r2 = pygame.draw.rect(screen, GREEN, (self.x, self.y+self.h, self.l, SCREEN_SIZE[1]-self.y+self.h))
-		self.rect = (r1, r2)
-		
-	def update(self):
-		"""
-		Update display of pipe
-		"""
-		r1 = pygame.draw.rect(screen, GREEN, (self.x, 0, self.l, self.y-self.h))
-		r2 = pygame.draw.rect(screen, GREEN, (self.x, self.y+self.h, self.l, SCREEN_SIZE[1]-self.y+self.h))
-		self.rect = (r1, r2)
-	
-	
-class PipeGestionnary:
+	if path is None or completed is None:
+		return
+	genome, scores = completed[0], completed[1]
+	best = int(np.argmax(scores))
+	runtime.export(path, genome.individual(best), features, scores[best])
+	print(f"champion exported to {path} (fitness {scores[best]})")
+
+
+def trainIslands(args, parser, seed, instruments, network, breeding, options, stats_log=None):
 	"""
-	Class PipeGestionnary
-	Attributs:
-		-> nb : number of pipe
-		-> pipes : list containing all the pipes
+	Training loop of the island model: the islands evolve alone during an epoch
+	of args.migration_interval generations, then exchange their best birds
 	"""
-	
-	def __init__(self, x, nb):
-		"""
-		PipeGestionnary constructor
-		Parameters:
-			-> x : initial position of the first pipe
-			-> nb : number of pipes
-		Init self.pipes with random pipes and each one spaced of PIPE_SPACE px
-		"""
-		self.nb = nb
-		self.pipes = pipes = [Pipe(i*PIPE_SPACE + x,
-						random.randint(PIPE_HEIGHT, screen.get_size()[1]-PIPE_HEIGHT),
-						PIPE_HEIGHT, PIPE_WIDTH)
-						for i in range(self.nb)]
-	def update(self, move):
-		"""
-		Update the position of the all pipes using PIPE_SPEED constant
-		Sort pipes by increasing horizontal position
-		If one pipes disapear in the left side, it is replaced on the right
-		"""
-		for pipe in self.pipes:
-			if move:
-				pipe.x -= 1.5
-			pipe.update()
-		if self.pipes[0].x + self.pipes[0].l < 0:
-			self.pipes[0].x = self.pipes[self.nb-1].x + PIPE_SPACE
+	workers = args.workers if args.workers > 1 else None
+	model = islands.IslandModel(network, args.islands, args.population // args.islands, seed,
+								args.topology, args.migrants, workers)
+	gen = 0
+	if args.resume:
+		path = checkpoint.latest(args.checkpoint_dir)
+		if path is None:
+			parser.error(f'no checkpoint in {args.checkpoint_dir}')
+		state = checkpoint.load(path)
+		if (state['genome'].model != network or state['genome'].buffer.shape != model.genome.buffer.shape
+				or state['islands'] != args.islands):
+			parser.error(f'{path} does not match {args.islands} islands of {args.population // args.islands} x {network}')
+		if state['features'] not in (None, tuple(args.features)):
+			parser.error(f"{path} has other inputs, resume it with --features {' '.join(state['features'])}")
+		model.genome.buffer[...] = state['genome'].buffer
+		model.scores[...] = state['scores'].reshape(model.scores.shape)
+		model.rng_states, model.schedules, model.initialised = state['rng_state'], state['schedule'], True
+		gen = state['generation']
+		print(f"resumed from {path}")
+	checkpointer = checkpoint.Checkpointer(args.checkpoint_dir) if args.checkpoint_every > 0 else None
+	#Copy of the last completed epoch: (genome, scores, gen, rng states and schedules of the islands),
+	#saved if the training is stopped, the shared arrays changing during the next epoch
+	completed, saved = None, gen
+	try:
+		while True:
+			with instruments.phase('epoch'):
+				game_scores = model.evolve(args.migration_interval, args.course_seed, args.courses, args.score_cap, breeding,
+										**options)
+			with instruments.phase('migration'):
+				model.migrate()
+			for k in range(args.migration_interval):
+				gen += 1
+				print(f"########## GENERATION N°{gen} ##########")
+				print(f"score : {game_scores[:, k].max()}  islands : {' '.join(str(s) for s in game_scores[:, k])}")
+			instruments.count('generations', args.migration_interval)
+			instruments.count('migrations')
+			if args.metrics_file is not None:
+				instruments.dump(args.metrics_file, generation=gen, game_score=int(game_scores[:, -1].max()))
 			
-		self.pipes = sorted(self.pipes, key=lambda p: p.x)
-		
-def buildGeneration(parents=[]):
-	if parents == []:
-		return [Bird(100, screen.get_size()[1]//2, 10) for _ in range(NB_INDIVIDUAL)]
-		
-	elite = []
-	p = sorted(parents, key=lambda x: -x.score)
-
-	nbElite = 5
-	for i in range(nbElite):
-		p[i].reset()
-		elite.append(p[i])
-	for i in range(nbElite):
-		bird = Bird(100, screen.get_size()[1]//2, 10, False)
-		p1 = random.randint(0, nbElite-1)
-		p2 = p1
-		bird.parameters = dnn.procreate(elite[p1].parameters, elite[p2].parameters, MUTATION_PROB)
-		elite.append(bird)
-	for i in range(NB_INDIVIDUAL - 2*nbElite):
-		bird = Bird(100, screen.get_size()[1]//2, 10, False)
-		p1 = random.randint(0, nbElite-1)
-		p2 = random.randint(0, nbElite-1)
-		while p1 == p2:
-			p2 = random.randint(0, nbElite-1)
-		bird.parameters = dnn.procreate(elite[p1].parameters, elite[p2].parameters, MUTATION_PROB)
-		elite.append(bird)
-	return elite
-	
+			completed = (model.genome.copy(), model.scores.ravel().copy(), gen, model.rng_states, model.schedules)
+			if stats_log is not None:
+				stats_log.submit(gen, game_scores[:, -1].max(), completed[1], completed[0], instruments)
+			if checkpointer is not None and gen // args.checkpoint_every > saved // args.checkpoint_every:
+				checkpointer.submit(*completed, islands=args.islands, features=args.features)
+				saved = gen
+	finally:
+		exportChampion(args.export, completed, args.features)
+		if stats_log is not None:
+			stats_log.close()
+		model.close()
+		instruments.close()
+		#Last, as it raises the error of a failed checkpoint
+		if checkpointer is not None:
+			if completed is not None and saved != completed[2]:
+				checkpointer.submit(*completed, islands=args.islands, features=args.features)
+			checkpointer.close()
 
 
-#Screen initialisation
-screen = pygame.display.set_mode(SCREEN_SIZE)
-pygame.display.set_caption('FlappyIA')
-birds = []
-gen = 0
-while True:
-	gen += 1
-	game_score = 0
-	#Init bird and pipes
-	birds = buildGeneration(birds)
-	pipes = PipeGestionnary(300, 5)
-	#Game const to control the game and reset it after a death
-	game = True
-	print(f"########## GENERATION N°{gen} ##########")
-	while game:
-		#Event gestion
-		for event in pygame.event.get():
-			#If display closed
-			if event.type == pygame.QUIT:
-				pygame.quit()
-				quit()
-						
-		#Clear screen
-		screen.fill(WHITE)
-		
-		#Search next pipe
-		closest_id = 0
-		while pipes.pipes[closest_id].x < birds[0].x:
-			closest_id += 1
-		
-		if abs(pipes.pipes[closest_id].x - birds[0].x) <= 1:
-			game_score += 1
-				
-		#If bird touch a pipe -> dead	
-		nb_deads = 0
-		for bird in birds:
-			if bird.alive:
-				if bird.rect.colliderect(pipes.pipes[0].rect[0]) or bird.rect.colliderect(pipes.pipes[0].rect[1]):
-					bird.alive = False
+def main():
+	parser = argparse.ArgumentParser(description='Train FlappyIA with a genetic algorithm')
+	parser.add_argument('--headless', action='store_true', help='train without display nor FPS limit')
+	parser.add_argument('--spectate', action='store_true',
+						help='train headless at full speed and watch it in a separate viewer window')
+	parser.add_argument('--spectate-birds', type=int, default=10,
+						help='number of living birds drawn individually by the viewer, the first ones of the population')
+	parser.add_argument('--seed', type=int, default=None, help='seed of the run, a random one if not given')
+	parser.add_argument('--population', type=int, default=NB_INDIVIDUAL, help='number of birds of each generation')
+	parser.add_argument('--workers', type=int, default=1, help='number of processes evaluating the population (headless only)')
+	parser.add_argument('--score-cap', type=int, default=None,
+						help='end a generation once the leader reaches this score (frames survived)')
+	parser.add_argument('--course-seed', type=int, default=None,
+						help='play every generation on the course of this seed instead of a new one')
+	parser.add_argument('--cache-size', type=int, default=10000,
+						help='with --course-seed, number of scores (genome, course) kept to skip the replay of known genomes, '
+						'0 to disable the cache')
+	parser.add_argument('--metrics-file', default=None, help='JSON-lines file receiving the metrics after each generation')
+	parser.add_argument('--stats-dir', default=None,
+						help='directory of the columnar log of the statistics of each generation, see stats.py for the report')
+	parser.add_argument('--metrics-port', type=int, default=None, help='serve the metrics as JSON on this local port')
+	parser.add_argument('--checkpoint-dir', default='checkpoints',
+						help='directory of the checkpoints, it must hold none unless --resume is given')
+	parser.add_argument('--export', metavar='PATH',
+						help='export the best bird of the last generation when the training stops, see flappyiaSolo.py')
+	parser.add_argument('--checkpoint-every', type=int, default=10,
+						help='number of generations between two checkpoints, 0 to disable them')
+	parser.add_argument('--resume', action='store_true', help='restart from the last checkpoint of --checkpoint-dir')
+	parser.add_argument('--islands', type=int, default=1,
+						help='island model: number of sub-populations evolving in parallel (headless only, no fitness cache)')
+	parser.add_argument('--migration-interval', type=int, default=10,
+						help='island model: number of generations between two migrations')
+	parser.add_argument('--migrants', type=int, default=2,
+						help='island model: number of best birds sent by an island to each of its neighbours')
+	parser.add_argument('--topology', choices=islands.TOPOLOGIES, default='ring',
+						help='island model: ring (each island sends to the next one) or full (to all the others)')
+	parser.add_argument('--elites', type=int, default=evolution.ELITES,
+						help='number of best birds copied unchanged to the next generation')
+	parser.add_argument('--mutation-prob', type=float, default=evolution.MUTATION_PROB,
+						help='probability of mutation of each parameter of a child')
+	parser.add_argument('--mutation-scale', type=float, default=None,
+						help='standard deviation of the gaussian mutations, the mutated parameters are replaced '
+						'by uniform values in [-0.5, 0.5] if not given')
+	parser.add_argument('--mutation-schedule', choices=['fixed', 'adaptive'], default='fixed',
+						help='adaptive: adapt the mutation probability and scale to the stagnation of the fitness '
+						'and to the diversity, starting from --mutation-prob and --mutation-scale')
+	parser.add_argument('--optimizer', choices=sorted(optimizers.OPTIMIZERS), default='ga',
+						help='ga: elites and children of selected parents, es: evolution strategy, '
+						'cmaes: covariance matrix adaptation (the breeding options only apply to ga)')
+	parser.add_argument('--sigma', type=float, default=None,
+						help='es, cmaes: standard deviation of the perturbations at the start of the run')
+	parser.add_argument('--learning-rate', type=float, default=None, help='es: step size of the mean')
+	parser.add_argument('--selection', choices=sorted(evolution.SELECTIONS), default='truncation',
+						help='selection of the parents of the children')
+	parser.add_argument('--parents', type=int, default=5,
+						help='truncation selection: number of best birds the parents are drawn from')
+	parser.add_argument('--tournament-size', type=int, default=3,
+						help='tournament selection: number of birds of a tournament')
+	parser.add_argument('--hidden', type=int, nargs='+', default=DIMENSIONS[1:-1],
+						help='number of neurons of each hidden layer of the networks')
+	parser.add_argument('--courses', type=int, default=1,
+						help='number of courses played by each bird per generation, all at once (headless only)')
+	parser.add_argument('--aggregate', choices=simulation.AGGREGATES, default='mean',
+						help='fitness of a bird from its scores on the courses')
+	parser.add_argument('--quantile', type=float, default=0.25, help='quantile of the quantile aggregate')
+	parser.add_argument('--features', nargs='+', choices=sorted(features.FEATURES), default=list(features.DEFAULT_FEATURES),
+						help='inputs of the networks, computed for the whole population at once')
+	parser.add_argument('--activation', choices=sorted(dnn.ACTIVATIONS), default='sigmoid',
+						help='activation of the hidden layers, the output is always a sigmoid')
+	args = parser.parse_args()
+	if args.workers > 1 and not args.headless:
+		parser.error('--workers requires --headless')
+	if args.spectate:
+		args.headless = True
+		if args.workers > 1:
+			parser.error('--spectate requires a single worker')
+	if args.courses > 1 and (not args.headless or args.spectate):
+		parser.error('--courses requires --headless')
+	if args.population < 2:
+		parser.error('--population must be at least 2')
+	if args.islands > 1:
+		if not args.headless or args.spectate:
+			parser.error('--islands requires --headless')
+		if args.population % args.islands:
+			parser.error(f'--islands must divide the population of {args.population} birds')
+		if args.optimizer != 'ga':
+			parser.error('--islands requires the ga optimizer')
+	if not args.resume and args.checkpoint_every > 0 and checkpoint.latest(args.checkpoint_dir) is not None:
+		parser.error(f'{args.checkpoint_dir} holds the checkpoints of another run, '
+					'continue it with --resume or choose another --checkpoint-dir')
+	size = args.population // args.islands
+	if args.optimizer == 'ga' and not 0 <= args.elites < size:
+		parser.error(f'--elites must be between 0 and {size - 1}')
+	if args.optimizer == 'ga' and args.selection == 'truncation' and not 2 <= args.parents <= size:
+		parser.error(f'--parents must be between 2 and {size}')
+	options = {'features': tuple(args.features), 'aggregate': args.aggregate, 'quantile': args.quantile}
+	selection = evolution.SELECTIONS[args.selection]
+	if args.selection == 'truncation':
+		selection = functools.partial(selection, k=args.parents)
+	elif args.selection == 'tournament':
+		selection = functools.partial(selection, size=args.tournament_size)
+	network = dnn.ModelSpec([len(args.features)] + args.hidden + DIMENSIONS[-1:],
+							[args.activation] * len(args.hidden) + ['sigmoid'])
+	schedule = None
+	if args.mutation_schedule == 'adaptive':
+		schedule = evolution.AdaptiveMutation(args.mutation_prob,
+							evolution.MUTATION_SCALE if args.mutation_scale is None else args.mutation_scale)
+	breeding = {'elites': args.elites, 'mutation_prob': args.mutation_prob, 'selection': selection,
+				'mutation_scale': args.mutation_scale, 'schedule': schedule}
+	if args.optimizer == 'ga':
+		if args.sigma is not None:
+			parser.error('--sigma requires the es or cmaes optimizer')
+		if args.learning_rate is not None:
+			parser.error('--learning-rate requires the es optimizer')
+		optimizer = optimizers.GeneticAlgorithm(**breeding)
+	else:
+		for option in ('elites', 'mutation_prob', 'mutation_scale', 'mutation_schedule', 'selection', 'parents',
+						'tournament_size'):
+			if getattr(args, option) != parser.get_default(option):
+				parser.error(f"--{option.replace('_', '-')} requires the ga optimizer")
+		hyperparameters = {} if args.sigma is None else {'sigma': args.sigma}
+		if args.learning_rate is not None:
+			if args.optimizer != 'es':
+				parser.error('--learning-rate requires the es optimizer')
+			hyperparameters['learning_rate'] = args.learning_rate
+		optimizer = optimizers.OPTIMIZERS[args.optimizer](**hyperparameters)
+	
+	#The whole run (population and courses) is determined by the seed
+	seed = np.random.SeedSequence(args.seed)
+	print(f"seed : {seed.entropy}")
+	rng = np.random.default_rng(seed)
+	instruments = instrumentation.Instrumentation(args.metrics_file is not None or args.metrics_port is not None
+												or args.stats_dir is not None)
+	stats_log = stats.StatsLog(args.stats_dir) if args.stats_dir is not None else None
+	if args.metrics_port is not None:
+		instruments.serve(args.metrics_port)
+	if args.islands > 1:
+		trainIslands(args, parser, seed, instruments, network, breeding, options, stats_log)
+		return
+	renderer = None if args.headless else Renderer(instruments)
+	spectator = Spectator(args.spectate_birds) if args.spectate else None
+	evaluator = ParallelEvaluator(network, args.population, args.workers) if args.workers > 1 else None
+	#State of the birds reused by every generation, the two genomes live in shared memory with workers
+	population = Population(args.population, network, evaluator.genomes if evaluator is not None else None, args.courses)
+	genome = population.genome
+	scores = None
+	gen = 0
+	if args.resume:
+		path = checkpoint.latest(args.checkpoint_dir)
+		if path is None:
+			parser.error(f'no checkpoint in {args.checkpoint_dir}')
+		state = checkpoint.load(path)
+		if state['islands'] != 1:
+			parser.error(f"{path} is a checkpoint of {state['islands']} islands, resume it with --islands {state['islands']}")
+		if state['genome'].model != network or state['genome'].buffer.shape != genome.buffer.shape:
+			parser.error(f'{path} does not match the population {args.population} x {network}')
+		if state['features'] not in (None, tuple(args.features)):
+			parser.error(f"{path} has other inputs, resume it with --features {' '.join(state['features'])}")
+		genome.buffer[...] = state['genome'].buffer
+		scores, gen = state['scores'], state['generation']
+		rng.bit_generator.state = state['rng_state']
+		if schedule is not None and state['schedule'] is not None:
+			schedule.restore(state['schedule'])
+		if state['algorithm'] != args.optimizer:
+			parser.error(f"{path} is a checkpoint of the {state['algorithm']} optimizer, "
+						f"resume it with --optimizer {state['algorithm']}")
+		if args.optimizer != 'ga' and not state['optimizer']:
+			parser.error(f'{path} has no state of the {args.optimizer} optimizer')
+		optimizer.restore(state['optimizer'], genome, scores)
+		print(f"resumed from {path}")
+	#A new course each generation never gives a cache hit
+	cache = FitnessCache(args.cache_size) if args.course_seed is not None and args.cache_size > 0 else None
+	#Everything but the genome and the course changing a score
+	settings = (args.score_cap, tuple(args.features), args.courses, args.aggregate, args.quantile)
+	checkpointer = checkpoint.Checkpointer(args.checkpoint_dir) if args.checkpoint_every > 0 else None
+	#Last evaluated generation: (genome, scores, gen, rng state, schedule state, optimizer state),
+	#saved if the training is stopped
+	completed, saved = None, gen
+	try:
+		while True:
+			gen += 1
+			#Init birds
+			with instruments.phase('build_generation'):
+				optimizer.ask(population.spare, rng)
+				population.swap()
+				genome = population.genome
+			course_seed = args.course_seed if args.course_seed is not None else int(rng.integers(2**63))
+			courses = simulation.make_course(course_seed, courses=args.courses)
+			print(f"########## GENERATION N°{gen} ##########")
+			#Birds already played on this course keep their score
+			found = np.zeros(args.population, dtype=bool)
+			if cache is not None:
+				with instruments.phase('cache'):
+					keys, known, known_pipes, found = cache.lookup(genome, course_seed, settings)
+			#Play until every bird is dead or the leader reaches the score cap
+			with instruments.phase('evaluation'):
+				if evaluator is None:
+					observers = [] if renderer is None else [renderer]
+					if spectator is not None:
+						spectator.writer.generation = gen
+						observers.append(spectator.writer)
+					scores, pipes = simulation.evaluate(genome, courses, args.score_cap, ~found, population=population,
+											observers=observers, instruments=instruments, **options)
 				else:
-					bird.score += 1
-					
-					#Update pipes and bird position
-					bird.makeDecision(pipes.pipes[closest_id])
-				
-					bird.update()
-			else:
-				nb_deads += 1
+					scores, pipes = evaluator.evaluate(genome, courses, args.score_cap, ~found, **options)
+			if cache is not None:
+				with instruments.phase('cache'):
+					scores[found], pipes[found] = known[found], known_pipes[found]
+					cache.store([key for key, f in zip(keys, found) if not f], scores[~found], pipes[~found])
+			#Pipes passed by the best bird, replayed or known
+			game_score = int(pipes.max())
+			instruments.count('generations')
+			instruments.count('cache_hits', int(found.sum()))
+			if args.metrics_file is not None:
+				instruments.dump(args.metrics_file, generation=gen, game_score=game_score)
 			
-		
-		if NB_INDIVIDUAL == nb_deads:
-			game = False
-		else:
-			pipes.update(True)
+			print(f"score : {game_score}")
 			
-			#Score display
-			text_score = FONT.render("Score : " + str(game_score), True, (255, 0, 0))
-			screen.blit(text_score, (20, 20))
-				
-			#Refresh display
-			pygame.display.update()
-			
-			clock.tick(FPS)
-	
-	print(f"score : {game_score}")
+			optimizer.tell(genome, scores)
+			completed = (genome, scores, gen, rng.bit_generator.state, None if schedule is None else schedule.state(),
+						optimizer.state())
+			if stats_log is not None:
+				stats_log.submit(gen, game_score, scores, genome, instruments)
+			if checkpointer is not None and gen % args.checkpoint_every == 0:
+				checkpointer.submit(*completed, algorithm=args.optimizer, features=args.features)
+				saved = gen
+	finally:
+		exportChampion(args.export, completed, args.features)
+		if evaluator is not None:
+			evaluator.close()
+		if spectator is not None:
+			spectator.close()
+		if stats_log is not None:
+			stats_log.close()
+		instruments.close()
+		#Last, as it raises the error of a failed checkpoint
+		if checkpointer is not None:
+			if completed is not None and saved != completed[2]:
+				checkpointer.submit(*completed, algorithm=args.optimizer, features=args.features)
+			checkpointer.close()
+
 
+if __name__ == "__main__":
+	main()
@@ -1,6 +1,8 @@
 import pygame
 import math
 import random
+import sys
+from runtime import Champion
 
 #Initialisation of pygame
 pygame.init()
@@ -28,6 +30,10 @@ GRAVITY = 0.15
 #Execution speed
 FPS = 60
 
+#The bird is played by the champion exported by flappia.py --export given on the command line,
+#by the spacebar otherwise
+champion = Champion.load(sys.argv[1]) if len(sys.argv) > 1 else None
+
 class Bird:
 	"""
 	Class Bird
@@ -132,7 +138,8 @@ class PipeGestionnary:
 	Class PipeGestionnary
 	Attributs:
 		-> nb : number of pipe
-		-> pipes : list containing all the pipes
+		-> pipes : list containing all the pipes, used as a ring buffer
+		-> first : index in pipes of the leftmost pipe
 	"""
 	
 	def __init__(self, x, nb):
@@ -148,20 +155,28 @@ class PipeGestionnary:
 						random.randint(PIPE_HEIGHT, screen.get_size()[1]-PIPE_HEIGHT),
 						PIPE_HEIGHT, PIPE_WIDTH)
 						for i in range(self.nb)]
+		self.first = 0
 	def update(self, move):
 		"""
 		Update the position of the all pipes using PIPE_SPEED constant
-		Sort pipes by increasing horizontal position
-		If one pipes disapear in the left side, it is replaced on the right
+		If the first pipe disapear in the left side, it is replaced on the right
+		and the next one becomes the first, so the pipes never need to be sorted
 		"""
 		for pipe in self.pipes:
 			if move:
 				pipe.x -= 1.5
 			pipe.update()
-		if self.pipes[0].x + self.pipes[0].l < 0:
-			self.pipes[0].x = self.pipes[self.nb-1].x + PIPE_SPACE
-			
-		self.pipes = sorted(self.pipes, key=lambda p: p.x)
+		first = self.pipes[self.first]
+		if first.x + first.l < 0:
+			first.x = self.pipes[self.first-1].x + PIPE_SPACE
+			self.first = (self.first + 1) % self.nb
+
+	def ahead(self, x):
+		"""
+		Return the (x, y of the hole) of the pipes whose left side is ahead of x, from the nearest one
+		"""
+		pipes = (self.pipes[(self.first + i) % self.nb] for i in range(self.nb))
+		return [(pipe.x, pipe.y) for pipe in pipes if pipe.x >= x]
 	
 
 
@@ -191,13 +206,18 @@ while True:
 					if not bird.alive and bird.y == SCREEN_SIZE[1]:
 						game = False
 						break
+		
+		#The champion decides to jump from the next pipes
+		if champion is not None and bird.alive:
+			if champion.jump(bird.y, bird.vy, pipes.ahead(bird.x)):
+				bird.jump()
 						
 		#Clear screen
 		screen.fill(WHITE)
 		
 
 		#If bird touch a pipe -> dead
-		if bird.rect.colliderect(pipes.pipes[0].rect[0]) or bird.rect.colliderect(pipes.pipes[0].rect[1]):
+		if bird.rect.colliderect(pipes.pipes[pipes.first].rect[0]) or bird.rect.colliderect(pipes.pipes[pipes.first].rect[1]):
 			bird.alive = False
 		
 		#Score count -> searching the pipe where the bird is (okay it's not opti but don't juge)
@@ -0,0 +1,77 @@
+import numpy as np
+import dnn
+
+
+def genome_size(model):
+	"""
+	Return the number of parameters of a network, model being a dnn.ModelSpec or its dimensions
+	"""
+	dimensions = dnn.as_model(model).dimensions
+	return sum(dimensions[c] * (dimensions[c - 1] + 1) for c in range(1, len(dimensions)))
+
+
+class Genome:
+	"""
+	Class Genome
+	Parameters of one individual or of a whole population stored in a single contiguous buffer
+	Attributs:
+		-> model : dnn.ModelSpec of the networks
+		-> dimensions : number of neurons of each layer
+		-> buffer : contiguous array, shape (size,) for one individual or (population, size)
+		-> parameters : dict of zero-copy views on buffer, 'W' + str(c) and 'b' + str(c)
+			with the shapes expected by dnn.forward_propagation and dnn.procreate,
+			or by dnn.batch_forward_propagation and dnn.batch_procreate for a population
+	"""
+
+	def __init__(self, model, population=None, buffer=None, dtype=None):
+		"""
+		Genome constructor
+		Parameters:
+			-> model : dnn.ModelSpec, or number of neurons of each layer for the default one
+			-> population : number of individuals, None for a single individual
+			-> buffer : existing buffer to use (not copied), allocated if None
+			-> dtype : type of the parameters, the one of model if None
+		"""
+		self.model = dnn.as_model(model)
+		self.dimensions = dimensions = self.model.dimensions
+		dtype = self.model.dtype if dtype is None else dtype
+		shape = (genome_size(dimensions),) if population is None else (population, genome_size(dimensions))
+		self.buffer = np.zeros(shape, dtype=dtype) if buffer is None else buffer.reshape(shape)
+		self.parameters = {}
+
+		lead = self.buffer.shape[:-1]
+		offset = 0
+		for c in range(1, len(dimensions)):
+			n_out, n_in = dimensions[c], dimensions[c - 1]
+			self.parameters['W' + str(c)] = self.buffer[..., offset:offset + n_out*n_in].reshape(lead + (n_out, n_in))
+			offset += n_out * n_in
+			self.parameters['b' + str(c)] = self.buffer[..., offset:offset + n_out].reshape(lead + (n_out, 1))
+			offset += n_out
+
+	@classmethod
+	def random(cls, model, population=None, dtype=None, rng=None):
+		"""
+		Return a genome initialised by dnn.initialisation
+		"""
+		genome = cls(model, population, dtype=dtype)
+		dnn.initialisation(genome.model, genome.parameters, rng)
+		return genome
+
+	@property
+	def population(self):
+		"""
+		Number of individuals, None for a single individual
+		"""
+		return self.buffer.shape[0] if self.buffer.ndim == 2 else None
+
+	def individual(self, i):
+		"""
+		Return the genome of the i-th individual, sharing its buffer
+		"""
+		return Genome(self.model, buffer=self.buffer[i])
+
+	def copy(self):
+		"""
+		Return a genome with a copy of the buffer
+		"""
+		return Genome(self.model, self.population, self.buffer.copy())
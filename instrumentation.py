@@ -0,0 +1,211 @@
+import json
+import threading
+import time
+import numpy as np
+
+#Number of buckets of the histograms, bucket i counts the durations in [2^(i-1), 2^i[ ns
+NB_BUCKETS = 48
+
+
+class Histogram:
+	"""
+	Class Histogram
+	Distribution of the durations of a phase, with power of two buckets
+	Attributs:
+		-> count : number of durations recorded
+		-> total : sum of the durations (ns)
+		-> min : shortest duration (ns)
+		-> max : longest duration (ns)
+		-> buckets : number of durations in each bucket
+	"""
+
+	def __init__(self):
+		"""
+		Histogram constructor
+		"""
+		self.count = 0
+		self.total = 0
+		self.min = None
+		self.max = 0
+		self.buckets = np.zeros(NB_BUCKETS, dtype=np.int64)
+
+	def record(self, ns):
+		"""
+		Add a duration of ns nanoseconds
+		"""
+		self.count += 1
+		self.total += ns
+		self.min = ns if self.min is None else min(self.min, ns)
+		self.max = max(self.max, ns)
+		self.buckets[min(ns.bit_length(), NB_BUCKETS - 1)] += 1
+
+	def quantile(self, q):
+		"""
+		Return an upper bound of the q-quantile of the durations (ns)
+		"""
+		if self.count == 0:
+			return 0
+		i = int(np.searchsorted(np.cumsum(self.buckets), q * self.count))
+		return min(2 ** i, self.max)
+
+	def summary(self):
+		"""
+		Return a dict describing the histogram, the durations being in seconds
+		"""
+		return {
+			'count': self.count,
+			'total': self.total * 1e-9,
+			'mean': self.total / self.count * 1e-9 if self.count else 0,
+			'min': (self.min or 0) * 1e-9,
+			'p50': self.quantile(0.5) * 1e-9,
+			'p90': self.quantile(0.9) * 1e-9,
+			'p99': self.quantile(0.99) * 1e-9,
+			'max': self.max * 1e-9,
+			'buckets': self.buckets.tolist(),
+		}
+
+
+class Phase:
+	"""
+	Class Phase
+	Context manager recording its duration in a histogram
+	"""
+
+	def __init__(self, histogram):
+		self.histogram = histogram
+
+	def __enter__(self):
+		self.start = time.perf_counter_ns()
+		return self
+
+	def __exit__(self, *exc):
+		self.histogram.record(time.perf_counter_ns() - self.start)
+		return False
+
+
+class NullPhase:
+	"""
+	Class NullPhase
+	Context manager doing nothing, used when the instrumentation is disabled
+	"""
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		return False
+
+
+NULL_PHASE = NullPhase()
+
+
+class Instrumentation:
+	"""
+	Class Instrumentation
+	Counters and duration histograms of the phases of the training loop
+	Attributs:
+		-> enabled : False to make phase and count free
+		-> counters : dict name -> value
+		-> histograms : dict name -> Histogram
+		-> lock : protects the creation of counters and histograms against the snapshots
+		-> server : HTTP server of the metrics, None if not started
+	"""
+
+	def __init__(self, enabled=True):
+		"""
+		Instrumentation constructor
+		Parameters:
+			-> enabled : False to disable the recording
+		"""
+		self.enabled = enabled
+		self.counters = {}
+		self.histograms = {}
+		self.lock = threading.Lock()
+		self.server = None
+
+	def phase(self, name):
+		"""
+		Return a context manager timing a phase:
+			with instruments.phase('physics'):
+				...
+		"""
+		if not self.enabled:
+			return NULL_PHASE
+		histogram = self.histograms.get(name)
+		if histogram is None:
+			with self.lock:
+				histogram = self.histograms.setdefault(name, Histogram())
+		return Phase(histogram)
+
+	def count(self, name, value=1):
+		"""
+		Increase the counter name of value
+		"""
+		if not self.enabled:
+			return
+		if name not in self.counters:
+			with self.lock:
+				self.counters.setdefault(name, 0)
+		self.counters[name] += value
+
+	def snapshot(self):
+		"""
+		Return a dict of the counters and of the summary of the histograms
+		"""
+		with self.lock:
+			return {
+				'time': time.time(),
+				'counters': dict(self.counters),
+				'phases': {name: h.summary() for name, h in self.histograms.items()},
+			}
+
+	def totals(self):
+		"""
+		Return a dict phase name -> total time spent in it (seconds)
+		"""
+		with self.lock:
+			return {name: h.total * 1e-9 for name, h in self.histograms.items()}
+
+	def dump(self, path, **extra):
+		"""
+		Append a snapshot, with the extra fields, as a JSON line to the file path
+		"""
+		with open(path, 'a') as f:
+			f.write(json.dumps(dict(extra, **self.snapshot())) + '\n')
+
+	def serve(self, port, host='127.0.0.1'):
+		"""
+		Start a local HTTP server returning the snapshot as JSON in a background thread
+		http.server is only imported here, as the simulation workers never serve
+		"""
+		from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+		instruments = self
+
+		class Handler(BaseHTTPRequestHandler):
+			def do_GET(self):
+				body = json.dumps(instruments.snapshot()).encode()
+				self.send_response(200)
+				self.send_header('Content-Type', 'application/json')
+				self.send_header('Content-Length', str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def log_message(self, *args):
+				pass
+
+		self.server = ThreadingHTTPServer((host, port), Handler)
+		threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+	def close(self):
+		"""
+		Stop the HTTP server if it was started
+		"""
+		if self.server is not None:
+			self.server.shutdown()
+			self.server.server_close()
+			self.server = None
+
+
+#Instrumentation used when none is given, recording nothing
+DISABLED = Instrumentation(enabled=False)
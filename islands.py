@@ -0,0 +1,190 @@
+import copy
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+import dnn
+import simulation
+from evolution import buildGeneration
+from genome import Genome, genome_size
+from population import Population
+
+TOPOLOGIES = ('ring', 'full')
+
+#Shared state of the worker, attached to the shared memory of the model
+worker_state = {}
+
+
+def sources(i, nb_islands, topology):
+	"""
+	Return the islands sending their migrants to the island i
+	ring: each island receives from the previous one, full: from all the others
+	"""
+	if topology == 'ring':
+		return [(i - 1) % nb_islands]
+	return [j for j in range(nb_islands) if j != i]
+
+
+def migrate(buffers, scores, migrants, topology='ring'):
+	"""
+	Replace in place the worst birds of each island by the best ones of its sources
+	The migrants keep their score
+	Parameters:
+		-> buffers : genomes of the islands, shape (islands, size, genome size)
+		-> scores : scores of the islands, shape (islands, size)
+		-> migrants : number of birds sent by an island to each of its destinations
+		-> topology : 'ring' or 'full' (see sources)
+	"""
+	nb_islands = len(buffers)
+	rows = np.arange(nb_islands)[:, np.newaxis]
+	best = np.argsort(-scores, axis=1, kind='stable')[:, :migrants]
+	emigrants, emigrant_scores = buffers[rows, best], scores[rows, best]
+	for i in range(nb_islands):
+		origins = sources(i, nb_islands, topology)
+		worst = np.argsort(scores[i], kind='stable')[:migrants * len(origins)]
+		buffers[i, worst] = emigrants[origins].reshape(len(worst), -1)
+		scores[i, worst] = emigrant_scores[origins].ravel()
+
+
+def shared_arrays(buf, model, nb_islands, size):
+	"""
+	Return the views on the shared memory buf: genomes (2, islands, size, genome size) and scores (islands, size)
+	"""
+	genomes = np.ndarray((2, nb_islands, size, genome_size(model)), dtype=model.dtype, buffer=buf)
+	scores = np.ndarray((nb_islands, size), dtype=np.float64, buffer=buf, offset=genomes.nbytes)
+	return genomes, scores
+
+
+def init_worker(name, model, nb_islands, size):
+	"""
+	Initializer of the worker processes: attach the shared memory of the model
+	The workers share the resource tracker of the model, which owns and unlinks the memory
+	"""
+	shm = shared_memory.SharedMemory(name=name)
+	genomes, scores = shared_arrays(shm.buf, model, nb_islands, size)
+	worker_state.update(shm=shm, model=model, genomes=genomes, scores=scores, population=None)
+
+
+def evolve_island(i, generations, initialised, rng_state, course_seed, courses, max_frames, breeding, options):
+	"""
+	Evolve the island i alone during generations, from its genome and scores in shared memory
+	Each generation is played on the courses of course_seed, or on new courses drawn by the island
+	breeding is given to evolution.buildGeneration and options to simulation.evaluate
+	Return the new state of the generator of the island, the game score of each generation
+	and the new state of the mutation schedule of the island (None without one)
+	"""
+	model, genomes, scores = worker_state['model'], worker_state['genomes'], worker_state['scores']
+	size = scores.shape[1]
+	rng = np.random.default_rng()
+	rng.bit_generator.state = rng_state
+	genome, spare = Genome(model, size, genomes[0, i]), Genome(model, size, genomes[1, i])
+	if worker_state['population'] is None or worker_state['population'].n != courses * size:
+		worker_state['population'] = Population(size, courses=courses)
+	game_scores = []
+	for _ in range(generations):
+		buildGeneration(genome if initialised else None, scores[i], spare, rng, **breeding)
+		genome, spare = spare, genome
+		initialised = True
+		seed = course_seed if course_seed is not None else int(rng.integers(2**63))
+		scores[i], pipes = simulation.evaluate(genome, simulation.make_course(seed, courses=courses), max_frames,
+												population=worker_state['population'], **options)
+		game_scores.append(int(pipes.max()))
+	#The current genome of an island is always the first one between two epochs
+	if generations % 2 == 1:
+		genomes[0, i] = genome.buffer
+	schedule = breeding.get('schedule')
+	return rng.bit_generator.state, game_scores, None if schedule is None else schedule.state()
+
+
+class IslandModel:
+	"""
+	Class IslandModel
+	Sub-populations (islands) evolving independently in a pool of processes,
+	exchanging their best birds between two epochs
+	Genomes and scores are stored in shared memory so that they are never pickled
+	Attributs:
+		-> model : dnn.ModelSpec of the networks
+		-> nb_islands : number of islands
+		-> size : number of birds of an island
+		-> topology : 'ring' or 'full' (see sources)
+		-> migrants : number of birds sent by an island to each of its destinations
+		-> genome : genome.Genome of all the birds, island i being the rows i*size to (i+1)*size
+		-> scores : scores of the islands, shape (islands, size)
+		-> rng_states : state of the generator of each island
+		-> schedules : state of the mutation schedule of each island, None before the first epoch using one
+		-> initialised : False until the first generation is built
+	"""
+
+	def __init__(self, model, nb_islands, size, seed=None, topology='ring', migrants=2, nb_workers=None):
+		"""
+		IslandModel constructor
+		Parameters:
+			-> model : dnn.ModelSpec, or number of neurons of each layer for the default one
+			-> nb_islands : number of islands
+			-> size : number of birds of an island
+			-> seed : seed or np.random.SeedSequence, the generators of the islands are spawned from it
+			-> topology : 'ring' or 'full'
+			-> migrants : number of birds sent by an island to each of its destinations
+			-> nb_workers : number of processes, min(number of cores, nb_islands) if None
+		"""
+		if topology not in TOPOLOGIES:
+			raise ValueError(f"unknown topology {topology!r}, expected one of {TOPOLOGIES}")
+		if migrants * len(sources(0, nb_islands, topology)) >= size:
+			raise ValueError(f"{migrants} migrants per source do not fit in islands of {size} birds")
+		self.model = model = dnn.as_model(model)
+		self.nb_islands = nb_islands
+		self.size = size
+		self.topology = topology
+		self.migrants = migrants
+		nbytes = (2 * genome_size(model) * model.dtype.itemsize
+				+ np.dtype(np.float64).itemsize) * nb_islands * size
+		self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+		self.genomes, self.scores = shared_arrays(self.shm.buf, model, nb_islands, size)
+		self.scores[:] = 0
+		self.genome = Genome(model, nb_islands * size, self.genomes[0].reshape(nb_islands * size, -1))
+		seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+		self.rng_states = [np.random.default_rng(s).bit_generator.state for s in seed.spawn(nb_islands)]
+		self.schedules = None
+		self.initialised = False
+		nb_workers = nb_workers or min(multiprocessing.cpu_count(), nb_islands)
+		self.pool = multiprocessing.Pool(nb_workers, init_worker, (self.shm.name, model, nb_islands, size))
+
+	def evolve(self, generations, course_seed=None, courses=1, max_frames=None, breeding=None, **options):
+		"""
+		Evolve every island alone during generations (an epoch), each bird playing courses courses
+		breeding (elites, mutation_prob, selection, ...) is given to evolution.buildGeneration
+		and options to simulation.evaluate
+		A mutation schedule of breeding is copied for each island, which adapts it to its own progress
+		Return the game scores, shape (islands, generations)
+		"""
+		breeding = {} if breeding is None else breeding
+		tasks = []
+		for i in range(self.nb_islands):
+			island = breeding
+			if breeding.get('schedule') is not None:
+				island = dict(breeding, schedule=copy.deepcopy(breeding['schedule']))
+				if self.schedules is not None:
+					island['schedule'].restore(self.schedules[i])
+			tasks.append((i, generations, self.initialised, self.rng_states[i], course_seed, courses, max_frames, island,
+						options))
+		results = self.pool.starmap(evolve_island, tasks)
+		self.rng_states = [r[0] for r in results]
+		if breeding.get('schedule') is not None:
+			self.schedules = [r[2] for r in results]
+		self.initialised = True
+		return np.array([r[1] for r in results])
+
+	def migrate(self):
+		"""
+		Exchange the best birds of the islands (see migrate)
+		"""
+		migrate(self.genomes[0], self.scores, self.migrants, self.topology)
+
+	def close(self):
+		"""
+		Stop the workers and free the shared memory
+		"""
+		self.pool.terminate()
+		self.pool.join()
+		del self.genome, self.genomes, self.scores
+		self.shm.close()
+		self.shm.unlink()
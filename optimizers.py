@@ -0,0 +1,274 @@
+import numpy as np
+from evolution import buildGeneration
+
+#Largest genome of the full covariance matrix of CMAES, the bigger ones use a diagonal one (sep-CMA-ES)
+CMAES_MAX_DENSE = 1000
+
+
+def random_start(out, rng):
+	"""
+	First generation of the evolution strategies: random networks, like dnn.initialisation,
+	so that the search starts from the best of them rather than from a network whose decision
+	does not depend on its inputs, on a plateau of the fitness
+	"""
+	out.buffer[...] = rng.standard_normal(out.buffer.shape)
+	return out
+
+
+def centered_ranks(scores):
+	"""
+	Return the ranks of the scores scaled to [-0.5, 0.5], the tied scores sharing their mean rank
+	"""
+	if len(scores) < 2:
+		return np.zeros(len(scores))
+	_, inverse, counts = np.unique(scores, return_inverse=True, return_counts=True)
+	ranks = (np.cumsum(counts) - (counts + 1) / 2)[inverse]
+	return ranks / (len(scores) - 1) - 0.5
+
+
+class GeneticAlgorithm:
+	"""
+	Class GeneticAlgorithm
+	Optimizer of the original training: elites and children of selected parents (see evolution.buildGeneration)
+	Every optimizer has the same interface:
+		ask(out, rng) writes the genomes to evaluate in out (genome.Genome) and returns it
+		tell(genome, scores) gives the fitness of the genomes of the last ask
+		state() returns the arrays to checkpoint, restore(state, genome, scores) resumes from them
+	Attributs:
+		-> breeding : arguments of evolution.buildGeneration (elites, mutation_prob, selection, ...)
+		-> genome, scores : last generation and its fitness, None before the first tell
+	"""
+
+	def __init__(self, **breeding):
+		"""
+		GeneticAlgorithm constructor, breeding is given to evolution.buildGeneration
+		"""
+		self.breeding = breeding
+		self.genome, self.scores = None, None
+
+	def ask(self, out, rng):
+		"""
+		Build the next generation in out, a random one before the first tell
+		"""
+		return buildGeneration(self.genome, self.scores, out, rng, **self.breeding)
+
+	def tell(self, genome, scores):
+		"""
+		Keep the generation, the parents of the next one
+		genome must not be the out of the next ask
+		"""
+		self.genome, self.scores = genome, np.asarray(scores)
+
+	def state(self):
+		"""
+		The state of the algorithm is its last generation, which is already in the checkpoints
+		"""
+		return {}
+
+	def restore(self, state, genome, scores):
+		"""
+		Resume from the last generation
+		"""
+		self.tell(genome, scores)
+
+
+class EvolutionStrategy:
+	"""
+	Class EvolutionStrategy
+	Natural evolution strategy of OpenAI (Salimans et al., 2017): the birds are antithetic
+	gaussian perturbations mean +/- sigma * eps of a single network, the mean follows the gradient
+	estimated from the rank-normalized fitness, with Adam and an optional weight decay
+	The mean is the best network of a random first generation (see random_start)
+	With an odd population, the last bird is the mean itself
+	Attributs:
+		-> sigma : standard deviation of the perturbations
+		-> learning_rate : step size of Adam
+		-> weight_decay : L2 penalty of the mean
+		-> beta1, beta2 : decay rates of the moments of Adam
+		-> mean : parameters of the network, None before the first tell
+		-> m, v, t : moments and number of steps of Adam
+		-> eps : perturbations of the last ask, shape (population // 2, genome size)
+	"""
+
+	def __init__(self, sigma=0.1, learning_rate=0.03, weight_decay=0.0, beta1=0.9, beta2=0.999):
+		"""
+		EvolutionStrategy constructor
+		"""
+		self.sigma = sigma
+		self.learning_rate = learning_rate
+		self.weight_decay = weight_decay
+		self.beta1, self.beta2 = beta1, beta2
+		self.mean, self.eps = None, None
+
+	def ask(self, out, rng):
+		"""
+		Write the perturbations of the mean in out, random networks before the first tell
+		"""
+		if self.mean is None:
+			return random_start(out, rng)
+		half = out.population // 2
+		self.eps = rng.standard_normal((half, len(self.mean)))
+		np.add(self.mean, self.sigma * self.eps, out=out.buffer[:half], casting='same_kind')
+		np.subtract(self.mean, self.sigma * self.eps, out=out.buffer[half:2 * half], casting='same_kind')
+		out.buffer[2 * half:] = self.mean
+		return out
+
+	def tell(self, genome, scores):
+		"""
+		Move the mean along the estimated gradient of the fitness
+		"""
+		if self.mean is None:
+			self.mean = genome.buffer[np.argmax(scores)].astype(np.float64)
+			self.m, self.v, self.t = np.zeros_like(self.mean), np.zeros_like(self.mean), 0
+			return
+		half = len(self.eps)
+		ranks = centered_ranks(np.asarray(scores))
+		gradient = (ranks[:half] - ranks[half:2 * half]) @ self.eps / (2 * half * self.sigma)
+		gradient -= self.weight_decay * self.mean
+		self.t += 1
+		self.m = self.beta1 * self.m + (1 - self.beta1) * gradient
+		self.v = self.beta2 * self.v + (1 - self.beta2) * gradient ** 2
+		step = self.learning_rate * np.sqrt(1 - self.beta2 ** self.t) / (1 - self.beta1 ** self.t)
+		self.mean += step * self.m / (np.sqrt(self.v) + 1e-8)
+
+	def state(self):
+		"""
+		Return the mean and the moments of Adam
+		"""
+		if self.mean is None:
+			return {}
+		return {'mean': self.mean.copy(), 'm': self.m.copy(), 'v': self.v.copy(), 't': np.int64(self.t)}
+
+	def restore(self, state, genome, scores):
+		"""
+		Resume from a state returned by state, genome and scores are not needed
+		"""
+		self.mean, self.m, self.v, self.t = state['mean'], state['m'], state['v'], int(state['t'])
+
+
+class CMAES:
+	"""
+	Class CMAES
+	Covariance matrix adaptation evolution strategy (Hansen, The CMA Evolution Strategy: A Tutorial),
+	with the whole population as the number of offspring and its best half as the parents
+	The mean is the best network of a random first generation (see random_start)
+	The full covariance matrix costs n^2 memory and an eigendecomposition in n^3 per generation,
+	so above CMAES_MAX_DENSE parameters only its diagonal is adapted, with the faster learning
+	rates of sep-CMA-ES (Ros and Hansen, A Simple Modification in CMA-ES, 2008)
+	Attributs:
+		-> sigma : step size
+		-> diagonal : True to adapt only the diagonal of C, None to choose from the genome size
+		-> mean : parameters of the mean network, None before the first tell
+		-> C : covariance matrix, C = B diag(D^2) B^T, or its diagonal of shape (n,)
+		-> B, D : eigenvectors (None with a diagonal C) and square roots of the eigenvalues of C
+		-> pc, ps : evolution paths of C and sigma
+		-> y : steps (x - mean) / sigma of the last ask
+	"""
+
+	def __init__(self, sigma=0.5, diagonal=None):
+		"""
+		CMAES constructor, sigma is the initial step size
+		diagonal forces the diagonal covariance matrix, by default it is used above CMAES_MAX_DENSE parameters
+		"""
+		self.sigma = sigma
+		self.diagonal = diagonal
+		self.mean, self.y = None, None
+
+	def setup(self, n, population):
+		"""
+		Strategy parameters of the tutorial for a problem of dimension n
+		"""
+		mu = population // 2
+		weights = np.log((population + 1) / 2) - np.log(np.arange(1, mu + 1))
+		self.weights = weights / weights.sum()
+		self.mueff = 1 / np.sum(self.weights ** 2)
+		self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+		self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+		self.c1 = 2 / ((n + 1.3) ** 2 + self.mueff)
+		self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff))
+		if self.diagonal:
+			self.c1 *= (n + 2) / 3
+			self.cmu = min(1 - self.c1, self.cmu * (n + 2) / 3)
+		self.damps = 1 + 2 * max(0, np.sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+		self.chiN = np.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+	def ask(self, out, rng):
+		"""
+		Write population samples of N(mean, sigma^2 C) in out, random networks before the first tell
+		"""
+		if self.mean is None:
+			return random_start(out, rng)
+		n = out.buffer.shape[1]
+		self.setup(n, out.population)
+		self.y = rng.standard_normal((out.population, n)) * self.D
+		if self.B is not None:
+			self.y = self.y @ self.B.T
+		np.add(self.mean, self.sigma * self.y, out=out.buffer, casting='same_kind')
+		return out
+
+	def tell(self, genome, scores):
+		"""
+		Move the mean towards the best half of the birds and adapt C and sigma
+		"""
+		if self.mean is None:
+			n = genome.buffer.shape[1]
+			self.mean = genome.buffer[np.argmax(scores)].astype(np.float64)
+			if self.diagonal is None:
+				self.diagonal = n > CMAES_MAX_DENSE
+			self.C = np.ones(n) if self.diagonal else np.eye(n)
+			self.decompose()
+			self.pc, self.ps, self.generation = np.zeros(n), np.zeros(n), 0
+			return
+		n = len(self.mean)
+		best = np.argsort(-np.asarray(scores), kind='stable')[:len(self.weights)]
+		y = self.y[best]
+		y_w = self.weights @ y
+		self.mean += self.sigma * y_w
+		self.generation += 1
+		#C^(-1/2) y_w
+		invsqrt = y_w / self.D if self.B is None else self.B @ ((self.B.T @ y_w) / self.D)
+		self.ps = (1 - self.cs) * self.ps + np.sqrt(self.cs * (2 - self.cs) * self.mueff) * invsqrt
+		norm = np.linalg.norm(self.ps)
+		hsig = norm / np.sqrt(1 - (1 - self.cs) ** (2 * self.generation)) / self.chiN < 1.4 + 2 / (n + 1)
+		self.pc = (1 - self.cc) * self.pc + hsig * np.sqrt(self.cc * (2 - self.cc) * self.mueff) * y_w
+		self.C *= 1 - self.c1 - self.cmu + (1 - hsig) * self.c1 * self.cc * (2 - self.cc)
+		if self.diagonal:
+			self.C += self.c1 * self.pc ** 2 + self.cmu * self.weights @ y ** 2
+		else:
+			self.C += self.c1 * np.outer(self.pc, self.pc)
+			self.C += self.cmu * (y.T * self.weights) @ y
+		self.sigma *= np.exp(self.cs / self.damps * (norm / self.chiN - 1))
+		self.decompose()
+
+	def decompose(self):
+		"""
+		Update B and D from C
+		"""
+		if self.diagonal:
+			self.B, self.D = None, np.sqrt(np.maximum(self.C, 1e-20))
+			return
+		self.C = np.triu(self.C) + np.triu(self.C, 1).T
+		eigenvalues, self.B = np.linalg.eigh(self.C)
+		self.D = np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+	def state(self):
+		"""
+		Return the mean, the step size, the covariance matrix and the evolution paths
+		"""
+		if self.mean is None:
+			return {}
+		return {'mean': self.mean.copy(), 'sigma': np.float64(self.sigma), 'C': self.C.copy(), 'pc': self.pc.copy(),
+				'ps': self.ps.copy(), 'generation': np.int64(self.generation)}
+
+	def restore(self, state, genome, scores):
+		"""
+		Resume from a state returned by state, genome and scores are not needed
+		"""
+		self.mean, self.sigma, self.C = state['mean'], float(state['sigma']), state['C']
+		self.diagonal = self.C.ndim == 1
+		self.pc, self.ps, self.generation = state['pc'], state['ps'], int(state['generation'])
+		self.decompose()
+
+
+#Optimizers: name -> class
+OPTIMIZERS = {'ga': GeneticAlgorithm, 'es': EvolutionStrategy, 'cmaes': CMAES}
@@ -0,0 +1,87 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+import dnn
+import simulation
+from genome import Genome, genome_size
+
+#Genomes of the worker, attached to the shared memory of the evaluator
+worker_genomes = []
+
+
+def init_worker(names, model, population):
+	"""
+	Initializer of the worker processes: attach the shared genomes
+	The workers share the resource tracker of the evaluator, which owns and unlinks the memory
+	"""
+	for name in names:
+		shm = shared_memory.SharedMemory(name=name)
+		buffer = np.ndarray((population, genome_size(model)), dtype=model.dtype, buffer=shm.buf)
+		worker_genomes.append((shm, Genome(model, population, buffer)))
+
+
+def evaluate_shard(k, start, stop, courses, max_frames, alive, options):
+	"""
+	Play the birds start to stop of the k-th shared genome on the courses
+	options are given to simulation.evaluate
+	Return the fitness of the shard and the number of pipes passed by its birds
+	"""
+	genome = worker_genomes[k][1]
+	shard = Genome(genome.model, stop - start, genome.buffer[start:stop])
+	return simulation.evaluate(shard, courses, max_frames, alive, **options)
+
+
+class ParallelEvaluator:
+	"""
+	Class ParallelEvaluator
+	Evaluate a population with a pool of processes, each one playing a shard of it
+	Genomes are stored in shared memory so that they are never pickled
+	Attributs:
+		-> population : number of birds
+		-> nb_workers : number of processes
+		-> genomes : two genome.Genome in shared memory, used alternately as parents and children
+	"""
+
+	def __init__(self, model, population, nb_workers=None):
+		"""
+		ParallelEvaluator constructor
+		Parameters:
+			-> model : dnn.ModelSpec, or number of neurons of each layer for the default one
+			-> population : number of birds
+			-> nb_workers : number of processes, number of cores if None
+		"""
+		model = dnn.as_model(model)
+		self.population = population
+		self.nb_workers = nb_workers or multiprocessing.cpu_count()
+		size = population * genome_size(model) * model.dtype.itemsize
+		self.shms = [shared_memory.SharedMemory(create=True, size=size) for _ in range(2)]
+		self.genomes = [Genome(model, population,
+						np.ndarray((population, genome_size(model)), dtype=model.dtype, buffer=shm.buf))
+						for shm in self.shms]
+		self.pool = multiprocessing.Pool(self.nb_workers, init_worker,
+						([shm.name for shm in self.shms], model, population))
+
+	def evaluate(self, genome, courses, max_frames=None, alive=None, **options):
+		"""
+		Play all the birds of genome, one of self.genomes, on the courses (see simulation.evaluate)
+		Only the birds of the mask alive are played if it is given
+		options are given to simulation.evaluate
+		Return the fitness of each bird and the number of pipes it passed
+		"""
+		k = next(i for i, g in enumerate(self.genomes) if g is genome)
+		bounds = np.linspace(0, self.population, self.nb_workers + 1).astype(int)
+		shards = [(k, start, stop, courses, max_frames, None if alive is None else alive[start:stop], options)
+					for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+		results = self.pool.starmap(evaluate_shard, shards)
+		return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+	def close(self):
+		"""
+		Stop the workers and free the shared memory
+		"""
+		self.pool.terminate()
+		self.pool.join()
+		del self.genomes
+		for shm in self.shms:
+			shm.close()
+			shm.unlink()
@@ -0,0 +1,95 @@
+import numpy as np
+from constants import PIPE_SPACE, PIPE_WIDTH, BIRD_X, PIPES_X, NB_PIPES
+
+
+class PipeStream:
+	"""
+	Class PipeStream
+	Pipes of a course in a fixed capacity ring buffer: the pipe leaving the screen
+	is recycled to the tail in O(1), so the pipes never have to be sorted
+	and moving them allocates nothing
+	Attributs:
+		-> capacity : number of pipes
+		-> x : horizontal position of the pipes, in storage order
+		-> y : vertical position of the hole of each pipe, in storage order,
+			shape (courses, capacity) for several courses sharing the horizontal positions
+		-> course : vertical position of the holes of the successive pipes (see simulation.make_course)
+		-> next_hole : index in course of the hole of the next recycled pipe
+		-> head : index in x of the first pipe, the leftmost one
+		-> ahead : number of pipes from head to the next pipe ahead of the birds
+		-> bird_x : horizontal position of the birds
+	"""
+
+	def __init__(self, course, capacity=NB_PIPES, x=PIPES_X, bird_x=BIRD_X):
+		"""
+		PipeStream constructor
+		Parameters:
+			-> course : vertical position of the holes of the successive pipes, shape (length,) or (courses, length)
+			-> capacity : number of pipes
+			-> x : initial position of the first pipe
+			-> bird_x : horizontal position of the birds
+		"""
+		self.capacity = capacity
+		self.course = course
+		self.x = np.arange(capacity) * PIPE_SPACE + float(x)
+		self.y = course[..., np.arange(capacity) % course.shape[-1]]
+		self.next_hole = capacity
+		self.head = 0
+		self.ahead = 0
+		self.bird_x = bird_x
+		self.seek()
+
+	@property
+	def last(self):
+		"""
+		Index in x of the last pipe, the rightmost one
+		"""
+		return (self.head - 1) % self.capacity
+
+	def next(self):
+		"""
+		Return the index in x of the first pipe whose left side is ahead of the birds,
+		None if every pipe is behind them
+		"""
+		if self.ahead == self.capacity:
+			return None
+		return (self.head + self.ahead) % self.capacity
+
+	def seek(self):
+		"""
+		Move the cursor after the pipes whose left side went behind the birds
+		Return the number of pipes passed
+		"""
+		passed = 0
+		while self.ahead < self.capacity and self.x[(self.head + self.ahead) % self.capacity] < self.bird_x:
+			self.ahead += 1
+			passed += 1
+		return passed
+
+	def move(self, dx):
+		"""
+		Move the pipes of dx to the left, the first one is recycled if it left the screen
+		Return the number of pipes passing the birds
+		"""
+		self.x -= dx
+		passed = self.seek()
+		if self.x[self.head] + PIPE_WIDTH < 0:
+			self.recycle()
+		return passed
+
+	def recycle(self):
+		"""
+		Put the first pipe after the last one, with the next hole of the course
+		"""
+		self.x[self.head] = self.x[self.last] + PIPE_SPACE
+		self.y[..., self.head] = self.course[..., self.next_hole % self.course.shape[-1]]
+		self.next_hole += 1
+		self.head = (self.head + 1) % self.capacity
+		self.ahead -= 1
+
+	def ordered(self):
+		"""
+		Return copies of x and y from the first pipe to the last one
+		"""
+		order = (self.head + np.arange(self.capacity)) % self.capacity
+		return self.x[order], self.y[..., order]
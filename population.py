@@ -0,0 +1,79 @@
+import numpy as np
+from constants import SCREEN_SIZE, BIRD_MASS
+from genome import Genome
+
+
+class Population:
+	"""
+	Class Population
+	State of all the birds stored as preallocated arrays (struct of arrays),
+	reused from one generation to another by resetting them in place
+	Attributs:
+		-> n : number of birds
+		-> courses : number of courses played by each genome, the bird k * population + i
+			being the individual i of the genomes on the course k
+		-> y : vertical position of each bird
+		-> vy : vertical speed of each bird
+		-> mass : mass of each bird
+		-> alive : state of each bird
+		-> score : number of frames survived by each bird
+		-> next_decision : frame of the next decision of each bird (fast-forward mode)
+		-> genome : genome.Genome of the current generation, None without parameters
+		-> spare : genome.Genome receiving the next generation, None without parameters
+	"""
+
+	def __init__(self, n, model=None, genomes=None, courses=1):
+		"""
+		Population constructor
+		Parameters:
+			-> n : number of individuals of the genomes
+			-> model : dnn.ModelSpec or dimensions of the networks, None for a population without parameters
+			-> genomes : pair of existing genome.Genome (e.g. in shared memory) used as genome and spare
+			-> courses : number of courses played at once by each individual, there are n * courses birds
+		"""
+		self.courses = courses
+		self.n = n * courses
+		self.y = np.empty(self.n)
+		self.vy = np.empty(self.n)
+		self.mass = np.empty(self.n)
+		self.alive = np.empty(self.n, dtype=bool)
+		self.score = np.empty(self.n, dtype=np.int64)
+		self.next_decision = np.empty(self.n, dtype=np.int64)
+		if genomes is not None:
+			self.genome, self.spare = genomes
+		elif model is not None:
+			self.genome, self.spare = Genome(model, n), Genome(model, n)
+		else:
+			self.genome, self.spare = None, None
+		self.reset()
+
+	def reset(self, y=SCREEN_SIZE[1]//2, mass=BIRD_MASS, alive=None):
+		"""
+		Put all the birds back at their initial state, without any allocation
+		Parameters:
+			-> y : vertical initial position
+			-> mass : mass of the birds (scalar or array)
+			-> alive : initial state of the birds, all alive if None
+		"""
+		self.y[:] = y
+		self.vy[:] = 0
+		self.mass[:] = mass
+		self.alive[:] = True if alive is None else alive
+		self.score[:] = 0
+		self.next_decision[:] = 0
+
+	def swap(self):
+		"""
+		Exchange genome and spare, once spare received the next generation
+		"""
+		self.genome, self.spare = self.spare, self.genome
+
+	@property
+	def nbytes(self):
+		"""
+		Memory used by the population, genomes included
+		"""
+		arrays = [self.y, self.vy, self.mass, self.alive, self.score, self.next_decision]
+		genomes = [g.buffer for g in (self.genome, self.spare) if g is not None]
+		return sum(a.nbytes for a in arrays + genomes)
+
@@ -0,0 +1,141 @@
+import math
+from types import SimpleNamespace
+import numpy as np
+from constants import BIRD_X
+from dnn import THRESHOLDS
+from features import FEATURES
+
+#Version of the champion format, increased at each incompatible change
+CHAMPION_VERSION = 1
+#Activations as Python expressions of the variable v (see dnn.ACTIVATIONS)
+ACTIVATIONS = {
+	'sigmoid': '0.5 * tanh(0.5 * {v}) + 0.5',
+	'tanh': 'tanh({v})',
+	'relu': '({v} if {v} > 0.0 else 0.0)',
+}
+
+
+def export(path, genome, features, score=None):
+	"""
+	Write the network of one bird to a compact .npz file, loaded by Champion.load
+	Parameters:
+		-> path : path of the file
+		-> genome : genome.Genome of the bird (a single individual)
+		-> features : names of the inputs of the network (see features.FEATURES)
+		-> score : fitness of the bird, for information
+	"""
+	with open(path, 'wb') as f:
+		np.savez_compressed(f,
+				version=np.int64(CHAMPION_VERSION),
+				dimensions=np.array(genome.model.dimensions, dtype=np.int64),
+				activations=np.array(genome.model.activations),
+				features=np.array(features),
+				buffer=np.asarray(genome.buffer, dtype=np.float32),
+				score=np.float64(np.nan if score is None else score))
+
+
+def compile_network(dimensions, activations, buffer):
+	"""
+	Compile a network into a closure deciding from its inputs, with the same result as dnn.predict
+	The layers are unrolled into straight-line Python code with the parameters as constants,
+	so that a decision costs no array allocation, no dict lookup and no loop
+	Parameters:
+		-> dimensions : number of neurons of each layer, the output layer having one neuron
+		-> activations : name of the activation of each layer
+		-> buffer : parameters of the network in the layout of genome.Genome
+	Return a function (inputs) -> bool
+	"""
+	buffer = [float(v) for v in buffer]
+	previous = [f'x{i}' for i in range(dimensions[0])]
+	lines = [f"def decide(inputs):", f"\t{', '.join(previous)}, = inputs"]
+	offset = 0
+	for c in range(1, len(dimensions)):
+		n_out, n_in = dimensions[c], dimensions[c - 1]
+		W, b = buffer[offset:offset + n_out*n_in], buffer[offset + n_out*n_in:offset + n_out*(n_in + 1)]
+		offset += n_out * (n_in + 1)
+		current = []
+		for j in range(n_out):
+			z = ' + '.join(f'{W[j*n_in + i]!r} * {previous[i]}' for i in range(n_in)) + f' + {b[j]!r}'
+			if c == len(dimensions) - 1:
+				lines.append(f"\treturn {z} >= {THRESHOLDS[activations[-1]]!r}")
+				break
+			v = f'h{c}_{j}'
+			lines.append(f"\t{v} = {z}")
+			lines.append(f"\t{v} = {ACTIVATIONS[activations[c - 1]].format(v=v)}")
+			current.append(v)
+		previous = current
+	namespace = {'tanh': math.tanh}
+	exec('\n'.join(lines), namespace)
+	return namespace['decide']
+
+
+def observe(names, y, vy, pipes):
+	"""
+	Inputs of the network of one bird, computed by the functions of features.FEATURES
+	on a simulation of this bird alone, so that they are the ones of the training
+	Parameters:
+		-> names : names of the features
+		-> y, vy : vertical position and speed of the bird
+		-> pipes : (x, y of the hole) of the next pipe ahead of the bird and of the one after
+	"""
+	first, second = pipes[0], pipes[1] if len(pipes) > 1 else pipes[0]
+	sim = SimpleNamespace(x=BIRD_X, y=np.array([y], dtype=np.float64), vy=np.array([vy], dtype=np.float64), courses=1,
+						pipes_x=np.array([first[0], second[0]], dtype=np.float64),
+						pipes_y=np.array([first[1], second[1]], dtype=np.float64))
+	out = np.empty(1)
+	values = []
+	for name in names:
+		pipe, function = FEATURES[name]
+		function(sim, pipe, out)
+		values.append(float(out[0]))
+	return values
+
+
+class Champion:
+	"""
+	Class Champion
+	Standalone player of an exported network, which only needs numpy to be loaded
+	Attributs:
+		-> dimensions : number of neurons of each layer
+		-> activations : name of the activation of each layer
+		-> features : names of the inputs of the network
+		-> score : fitness of the bird when it was exported
+		-> decide : compiled network, function (inputs) -> bool (see compile_network)
+	"""
+
+	def __init__(self, dimensions, activations, features, buffer, score=None):
+		"""
+		Champion constructor
+		Raise ValueError for a feature or an activation unknown to this version
+		"""
+		self.dimensions = [int(d) for d in dimensions]
+		self.activations = [str(a) for a in activations]
+		self.features = [str(f) for f in features]
+		for name in self.features:
+			if name not in FEATURES:
+				raise ValueError(f"unknown feature {name!r}, expected one of {sorted(FEATURES)}")
+		for name, known in zip(self.activations, [ACTIVATIONS] * (len(self.activations) - 1) + [THRESHOLDS]):
+			if name not in known:
+				raise ValueError(f"unknown activation {name!r}, expected one of {sorted(known)}")
+		self.score = score
+		self.decide = compile_network(self.dimensions, self.activations, buffer)
+
+	@classmethod
+	def load(cls, path):
+		"""
+		Read a champion written by export
+		"""
+		with np.load(path) as data:
+			version = int(data['version'])
+			if version != CHAMPION_VERSION:
+				raise ValueError(f"{path}: champion version {version}, expected {CHAMPION_VERSION}")
+			score = float(data['score'])
+			return cls(data['dimensions'], data['activations'], data['features'], data['buffer'],
+						None if math.isnan(score) else score)
+
+	def jump(self, y, vy, pipes):
+		"""
+		Return True if the bird at height y with a vertical speed vy must jump
+		pipes are the (x, y of the hole) of the next pipe ahead of the bird and of the one after
+		"""
+		return self.decide(observe(self.features, y, vy, pipes))
@@ -0,0 +1,385 @@
+import numpy as np
+import dnn
+import collision
+import instrumentation
+from population import Population
+from pipes import PipeStream
+from features import FeatureExtractor, DEFAULT_FEATURES
+from constants import (SCREEN_SIZE, PIPE_WIDTH, PIPE_HEIGHT, PIPE_SPEED, GRAVITY,
+						BIRD_X, BIRD_MASS, JUMP_FORCE, PIPES_X, NB_PIPES)
+
+AGGREGATES = ('mean', 'min', 'quantile')
+
+
+def make_course(seed=None, length=NB_PIPES, courses=None):
+	"""
+	Return the vertical position of the hole of the successive pipes of a course
+	The same seed always gives the same course
+	Parameters:
+		-> seed : seed or np.random.Generator, a random course if None
+		-> length : number of holes, the course is repeated after them
+		-> courses : number of courses, shape (courses, length), the first one being the course of seed
+	"""
+	rng = np.random.default_rng(seed)
+	size = length if courses is None else (courses, length)
+	return rng.integers(PIPE_HEIGHT, SCREEN_SIZE[1]-PIPE_HEIGHT, size=size, endpoint=True).astype(np.float64)
+
+
+def individual_policy(parameters, functions=None):
+	"""
+	Build a policy deciding for each bird with its own network
+	Parameters:
+		-> parameters : list of dnn parameters, one per bird
+		-> functions : activations of the layers (see dnn.ModelSpec), sigmoid if None
+	Return a function (X, alive) -> boolean jump mask
+	"""
+	def policy(X, alive):
+		jump = np.zeros(len(parameters), dtype=bool)
+		for i in np.flatnonzero(alive):
+			jump[i] = dnn.predict(X[:, i:i+1], parameters[i], functions)[0, 0]
+		return jump
+	return policy
+
+
+def batch_policy(parameters, functions=None, courses=1):
+	"""
+	Build a policy deciding for the whole population with one matmul per layer
+	Parameters:
+		-> parameters : stacked dnn parameters of the population (see dnn.stack_parameters)
+		-> functions : activations of the layers (see dnn.ModelSpec), sigmoid if None
+		-> courses : number of courses played by each individual, the bird k * population + i
+			being the individual i on the course k
+	Return a function (X, alive) -> boolean jump mask
+	"""
+	def policy(X, alive):
+		return dnn.batch_predict(X, parameters, alive, functions=functions, courses=courses)
+	return policy
+
+
+def fitness(scores, courses=1, aggregate='mean', quantile=0.5):
+	"""
+	Fitness of each individual from the scores of its birds on the courses
+	Parameters:
+		-> scores : scores of the birds, the bird k * population + i being the individual i on the course k
+		-> courses : number of courses
+		-> aggregate : 'mean', 'min' or 'quantile' of the scores of an individual
+		-> quantile : quantile used by the 'quantile' aggregate
+	Return a float array of shape (population,)
+	"""
+	scores = np.reshape(scores, (courses, -1))
+	if aggregate == 'mean':
+		return scores.mean(axis=0)
+	if aggregate == 'min':
+		return scores.min(axis=0).astype(np.float64)
+	if aggregate == 'quantile':
+		return np.quantile(scores, quantile, axis=0)
+	raise ValueError(f"unknown aggregate {aggregate!r}, expected one of {AGGREGATES}")
+
+
+def evaluate(genome, courses, max_frames=None, alive=None, aggregate='mean', quantile=0.5, population=None,
+			observers=(), **options):
+	"""
+	Play every individual of genome on every course at once, as a single simulation
+	of len(courses) * population birds, and aggregate its scores (see fitness)
+	Parameters:
+		-> genome : genome.Genome of the population
+		-> courses : courses of shape (courses, length) (see make_course), or a single course
+		-> max_frames : score cap (see Simulation.run_generation)
+		-> alive : mask of the individuals played, the others get a fitness of 0
+		-> aggregate, quantile : see fitness
+		-> population : population.Population of len(courses) * population birds reused, allocated if None
+		-> observers : functions called with the simulation after each step
+		options are given to Simulation
+	Return the fitness of each individual and the number of pipes it passed on its best course
+	"""
+	courses = np.atleast_2d(courses)
+	n = len(courses) * genome.population
+	policy = batch_policy(genome.parameters, genome.model.activations, len(courses))
+	sim = Simulation(n, policy, course=courses if len(courses) > 1 else courses[0],
+					alive=None if alive is None else np.tile(alive, len(courses)), population=population, **options)
+	sim.observers.extend(observers)
+	scores = sim.run_generation(max_frames)
+	pipes = sim.pipes_passed().reshape(len(courses), -1).max(axis=0)
+	return fitness(scores, len(courses), aggregate, quantile), pipes
+
+
+class Simulation:
+	"""
+	Class Simulation
+	Headless simulation of a whole population, without pygame
+	Attributs:
+		-> n : number of birds
+		-> courses : number of courses played at once, the bird i playing the course i // (n / courses)
+		-> population : population.Population holding the state of the birds
+		-> x : horizontal position of every bird
+		-> y, vy, mass, alive, score : arrays of shape (n,) of the population
+		-> pipes : pipes.PipeStream of the course
+		-> pipes_x : horizontal position of the pipes, in the storage order of pipes
+		-> pipes_y : vertical position of the hole of each pipe, in the storage order of pipes,
+			shape (courses, pipes) with several courses
+		-> course : vertical position of the holes of the successive pipes (see make_course)
+		-> frame : number of frames simulated
+		-> game_score : number of pipes passed by the population
+		-> passes : frame of each pipe passing the birds (see pipes_passed)
+		-> observers : functions called with the simulation after each step
+		-> decision_interval : maximal number of frames between two decisions
+		-> threshold : maximal change of the inputs between two decisions, None for no limit
+		-> next_decision : frame of the next decision of each bird in fast-forward mode
+		-> last_death : in fast-forward mode, frame where step() would have removed the last bird which died
+		-> features : features.FeatureExtractor computing the network inputs
+		-> X : preallocated network inputs, shape (features, n)
+		-> instruments : instrumentation.Instrumentation timing the phases
+	"""
+
+	def __init__(self, n, policy, y=SCREEN_SIZE[1]//2, mass=BIRD_MASS, pipes_x=PIPES_X, course=None, nb_pipes=NB_PIPES,
+				decision_interval=1, threshold=None, alive=None, instruments=None, population=None, features=None):
+		"""
+		Simulation constructor
+		Parameters:
+			-> n : number of birds
+			-> policy : function (X, alive) -> boolean jump mask, X having shape (features, n)
+			-> y : vertical initial position of the birds
+			-> mass : mass of the birds
+			-> pipes_x : initial position of the first pipe
+			-> course : vertical position of the holes of the successive pipes, make_course() if None,
+				or several courses of shape (courses, length): all the courses share the horizontal
+				position of their pipes, the n birds being split in courses consecutive groups
+			-> nb_pipes : number of pipes on the screen
+			-> decision_interval : with N > 1, the fast-forward mode is used (see advance):
+				the birds decide at most every N frames and the physics is computed analytically in between
+			-> threshold : in fast-forward mode, a bird also decides as soon as its distance
+				to the next pipe (pipe_dx or pipe_dy) changed by more than threshold since its last decision
+			-> alive : initial state of the birds, the dead ones are not simulated (e.g. already known scores)
+			-> instruments : instrumentation.Instrumentation timing the phases of each frame
+			-> population : population.Population of n birds reset and reused in place, allocated if None
+			-> features : names of the network inputs (see features.FEATURES), DEFAULT_FEATURES if None
+		"""
+		self.n = n
+		self.policy = policy
+		self.population = Population(n) if population is None else population
+		self.population.reset(y, mass, alive)
+		self.x = BIRD_X
+		self.y = self.population.y
+		self.vy = self.population.vy
+		self.mass = self.population.mass
+		self.alive = self.population.alive
+		self.score = self.population.score
+		self.course = make_course(length=nb_pipes) if course is None else np.asarray(course, dtype=np.float64)
+		self.courses = len(self.course) if self.course.ndim == 2 else 1
+		self.pipes = PipeStream(self.course, nb_pipes, pipes_x, self.x)
+		self.pipes_x = self.pipes.x
+		self.pipes_y = self.pipes.y
+		self.frame = 0
+		self.game_score = 0
+		self.passes = []
+		self.observers = []
+		self.decision_interval = decision_interval
+		self.threshold = threshold
+		self.next_decision = self.population.next_decision
+		self.last_death = 0
+		self.features = FeatureExtractor(DEFAULT_FEATURES if features is None else features, n)
+		self.X = self.features.X
+		self.instruments = instrumentation.DISABLED if instruments is None else instruments
+
+	def next_pipe(self):
+		"""
+		Return the index of the first pipe whose left side is ahead of the birds
+		"""
+		return self.pipes.next()
+
+	def observations(self):
+		"""
+		Return the network inputs of all birds, shape (features, n)
+		"""
+		return self.features(self)
+
+	def collisions(self):
+		"""
+		Return the mask of birds touching one of the pipes in range (see collision.hits)
+		"""
+		y = self.y.reshape(self.courses, -1)
+		return collision.hits(self.x, y, self.pipes_x, self.pipes_y.reshape(self.courses, -1)).reshape(-1)
+
+	def step(self):
+		"""
+		Simulate one frame for the whole population
+		Kill the birds touching a pipe, make the others decide and apply gravity
+		Return the number of birds still alive
+		"""
+		with self.instruments.phase('collision'):
+			self.alive &= ~self.collisions()
+		alive = self.alive
+		self.score += alive
+
+		#Decisions -> jump
+		with self.instruments.phase('inference'):
+			jump = self.policy(self.observations(), alive) & alive
+		self.instruments.count('decisions', int(np.count_nonzero(alive)))
+
+		#Gravity, ceiling and floor
+		with self.instruments.phase('physics'):
+			self.vy[jump] = JUMP_FORCE / self.mass[jump]
+			self.vy[alive] += GRAVITY
+			self.y[alive] += self.vy[alive]
+			out = alive & ((self.y <= 0) | (self.y >= SCREEN_SIZE[1]))
+			np.clip(self.y, 0, SCREEN_SIZE[1], out=self.y)
+			self.vy[out] = 0
+			self.alive &= ~out
+			self.move_pipes(1)
+
+		return self.end_step(1)
+
+	def move_pipes(self, m):
+		"""
+		Move the pipes of m frames, the one leaving the screen is replaced on the right
+		m must not exceed frames_before_event()
+		"""
+		passed = self.pipes.move(m * PIPE_SPEED)
+		self.game_score += passed
+		self.passes.extend([self.frame + m] * passed)
+
+	def pipes_passed(self):
+		"""
+		Return the number of pipes passed by each bird, the ones passing the birds during the frames it scored
+		"""
+		return np.searchsorted(self.passes, self.score, side='right')
+
+	def end_step(self, m):
+		"""
+		Count m frames, notify the observers and return the number of birds still alive
+		"""
+		self.frame += m
+		self.instruments.count('frames', m)
+		for observer in self.observers:
+			observer(self)
+		return int(np.count_nonzero(self.alive))
+
+	def frames_before_event(self):
+		"""
+		Return the number of frames before the next pipe passes the birds
+		or the first pipe leaves the screen, the inputs of the birds jumping then
+		"""
+		i = self.next_pipe()
+		frames = int(np.floor((self.pipes_x[self.pipes.head] + PIPE_WIDTH) / PIPE_SPEED)) + 1
+		if i is not None:
+			frames = min(frames, int(np.floor((self.pipes_x[i] - self.x) / PIPE_SPEED)) + 1)
+		return frames
+
+	def frames_before_drift(self, vy):
+		"""
+		Return for each bird of vertical speed vy the number of frames of free fall
+		before its distance to the next pipe changes by more than threshold
+		"""
+		if self.threshold is None:
+			return np.full(len(vy), self.decision_interval)
+		#|vy*k + GRAVITY*k*(k+1)/2| > D, first root of a*k^2 + b*k -/+ D
+		D = self.threshold * SCREEN_SIZE[1]
+		a, b = GRAVITY / 2, vy + GRAVITY / 2
+		up = (-b + np.sqrt(b*b + 4*a*D)) / (2*a)
+		disc = b*b - 4*a*D
+		down = np.where((disc >= 0) & (b < 0), (-b - np.sqrt(np.maximum(disc, 0))) / (2*a), np.inf)
+		frames = np.floor(np.minimum(up, down)) + 1
+		horizontal = np.floor(self.threshold * SCREEN_SIZE[0] / PIPE_SPEED) + 1
+		return np.minimum(np.minimum(frames, horizontal), self.decision_interval).astype(np.int64)
+
+	def advance(self, max_frames=None):
+		"""
+		Fast-forward mode: each bird only decides at its own decision points,
+		between them it does not jump and its physics is computed analytically
+		with the parabola y0 + k*vy0 + GRAVITY*k*(k+1)/2
+		A bird decides again at the next frame if it jumped, else after decision_interval frames,
+		when one of its inputs changed by more than threshold, or when the next pipe
+		or the first pipe changes
+		A call only evaluates the birds due at the current frame: each of them is simulated alone
+		until its next decision point, so its y, vy and score are those of this point and a bird
+		dying before it is dead at once. Then the pipes jump to the next frame where a bird is due,
+		the other birds costing nothing until their own decision point
+		With decision_interval=1 the scores are the same as with step()
+		Tolerance, measured on 1000 birds against step():
+			-> random networks, decision_interval=16, no threshold: 99% of the scores are
+				identical and the mean relative error is below 0.5%
+			-> networks flying through the pipes need threshold <= 0.005
+				to keep the mean relative error below 5%, the error grows quickly above
+		Speed against step(), measured on 1000 birds of a hand-made policy flying through the pipes
+		for 20000 frames: most birds still decide at almost every frame, as a bird which jumps decides
+		again at the next frame and a threshold of 0.005 lets the pipes move for 3 frames only
+			-> decision_interval=16, threshold=0.005: 0.34x, the scores are identical
+			-> decision_interval=16, threshold=0.01: 0.39x, the mean relative error is 7%
+			-> decision_interval=4, no threshold: 7x, but the mean relative error is 96%
+		So this mode is not a faster replacement of step(): it only pays off for networks
+		which seldom need to decide, or for a training whose fitness is defined by it, and flappia.py does not offer it
+		Return the number of birds still alive
+		"""
+		#Decision of the birds whose decision point is reached
+		due = self.alive & (self.next_decision <= self.frame)
+		idx = np.flatnonzero(due)
+		if len(idx):
+			with self.instruments.phase('inference'):
+				jump = self.policy(self.observations(), due) & due
+			self.instruments.count('decisions', len(idx))
+			self.vy[jump] = JUMP_FORCE / self.mass[jump]
+			y0, vy0 = self.y[idx], self.vy[idx]
+			#Horizon of each bird: a bird which jumps decides again at the next frame,
+			#as it would keep jumping in step(), and every bird decides when the pipes change
+			h = self.frames_before_drift(vy0)
+			h[jump[idx]] = 1
+			h = np.minimum(h, self.frames_before_event())
+			if max_frames is not None:
+				h = np.minimum(h, max_frames - self.frame)
+			m = int(h.max())
+
+			#Trajectory of the due birds until the furthest horizon, shape (m+1, due)
+			with self.instruments.phase('physics'):
+				k = np.arange(m + 1)[:, np.newaxis]
+				Y = y0 + k * vy0 + GRAVITY * k * (k + 1) / 2
+
+			#Frame of death before the horizon: pipe touched at frame j or ceiling/floor reached after frame k-1
+			with self.instruments.phase('collision'):
+				PX = self.pipes_x - k[:m] * PIPE_SPEED
+				#The due birds of each course are consecutive in idx
+				bounds = np.searchsorted(idx, np.arange(self.courses + 1) * (self.n // self.courses))
+				pipes_y = self.pipes_y.reshape(self.courses, -1)
+				hit = np.concatenate([collision.first_hit(self.x, Y[:m, a:b], PX, pipes_y[c])
+									for c, (a, b) in enumerate(zip(bounds[:-1], bounds[1:]))])
+				hit = np.where((hit < 0) | (hit >= h), m + 1, hit)
+				out = ((Y[1:] <= 0) | (Y[1:] >= SCREEN_SIZE[1])) & (k[1:] <= h)
+				bound = np.where(out.any(axis=0), out.argmax(axis=0) + 1, m + 1)
+				death = np.minimum(hit, bound)
+
+			with self.instruments.phase('physics'):
+				dead = death <= h
+				self.score[idx] += np.minimum(death, h)
+				self.y[idx] = np.clip(Y[np.minimum(death, h), np.arange(len(idx))], 0, SCREEN_SIZE[1])
+				self.vy[idx] = vy0 + h * GRAVITY
+				self.vy[idx[dead & (bound <= hit)]] = 0
+				self.next_decision[idx] = self.frame + h
+				self.alive[idx[dead]] = False
+				#step() removes a bird after the frame leaving the screen, or at the frame touching a pipe
+				removal = np.where(bound <= hit, bound, hit + 1)[dead]
+				if len(removal):
+					self.last_death = max(self.last_death, self.frame + int(removal.max()))
+
+		#Next frame where a bird is due, or where step() would remove the last bird
+		alive = self.alive
+		target = int(self.next_decision[alive].min()) if alive.any() else self.last_death
+		m = max(target - self.frame, 1)
+		if max_frames is not None:
+			m = max(1, min(m, max_frames - self.frame))
+		with self.instruments.phase('physics'):
+			self.move_pipes(m)
+		return self.end_step(m)
+
+	def run_generation(self, max_frames=None):
+		"""
+		Simulate until every bird is dead or max_frames is reached
+		A bird alive at each frame scores one point per frame, so max_frames
+		is also the score cap: the generation ends once the leader reaches it
+		Return the score of each bird
+		"""
+		if self.decision_interval > 1:
+			while self.advance(max_frames) and (max_frames is None or self.frame < max_frames):
+				pass
+		else:
+			while self.step() and (max_frames is None or self.frame < max_frames):
+				pass
+		return self.score
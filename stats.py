@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import numpy as np
+import dnn
+
+#Quantiles of the fitness recorded at each generation: min, median, p90, max
+QUANTILES = (0, 0.5, 0.9, 1)
+#Number of buckets of the survival histogram, bucket i counts the fitness in [2^(i-1), 2^i[ frames
+NB_SURVIVAL_BUCKETS = 32
+#Name of the schema of a log directory
+SCHEMA = 'columns.json'
+
+
+def survival_histogram(scores):
+	"""
+	Return the number of birds in each power of two bucket of fitness (see NB_SURVIVAL_BUCKETS)
+	"""
+	buckets = np.frexp(np.floor(np.maximum(scores, 0)))[1]
+	return np.bincount(np.minimum(buckets, NB_SURVIVAL_BUCKETS - 1), minlength=NB_SURVIVAL_BUCKETS)
+
+
+def diversity(buffer, chunk=dnn.CHUNK):
+	"""
+	Return the mean over the parameters of their standard deviation in the population
+	The means and squared deviations of chunks of individuals are merged (Chan et al.),
+	so that the population is never copied to float64 at once
+	"""
+	n, mean, m2 = 0, 0.0, 0.0
+	for start in range(0, len(buffer), chunk):
+		rows = np.array(buffer[start:start + chunk], dtype=np.float64)
+		k, rows_mean = len(rows), rows.mean(axis=0)
+		delta = rows_mean - mean
+		mean = mean + delta * (k / (n + k))
+		rows -= rows_mean
+		m2 = m2 + np.einsum('ij,ij->j', rows, rows) + delta ** 2 * (n * k / (n + k))
+		n += k
+	return float(np.sqrt(m2 / n).mean())
+
+
+def load(directory):
+	"""
+	Read a log written by StatsLog
+	Return a dict column name -> read-only memory-mapped array of shape (rows, ...)
+	A row partially written by an interrupted run is ignored
+	"""
+	with open(os.path.join(directory, SCHEMA)) as f:
+		schema = json.load(f)
+	columns = {}
+	for name, (dtype, shape) in schema.items():
+		path = os.path.join(directory, name + '.dat')
+		row = np.dtype(dtype).itemsize * int(np.prod(shape))
+		columns[name] = (path, dtype, shape, os.path.getsize(path) // row)
+	rows = min(c[3] for c in columns.values()) if columns else 0
+	return {name: np.memmap(path, dtype, 'r', shape=(rows, *shape)) if rows else np.zeros((0, *shape), dtype)
+			for name, (path, dtype, shape, _) in columns.items()}
+
+
+class StatsLog:
+	"""
+	Class StatsLog
+	Streaming statistics of the generations, appended to a columnar log in a background thread
+	The statistics are computed by the training loop, so that only a row of a few numbers waits to be written
+	and the genome is never copied
+	Each column is a raw binary file <name>.dat of fixed size rows, described in columns.json,
+	and is read back as a memory-mapped array (see load):
+		generation, game_score : number of the generation and pipes passed by its leader
+		fitness : quantiles QUANTILES of the fitness of the birds
+		survival : histogram of the fitness in frames (see survival_histogram)
+		diversity : mean standard deviation of the parameters (see diversity)
+		seconds : wall-clock time since the previous row
+		phase_<name> : time spent in each phase of the instrumentation since the previous row
+	A column appearing after the first rows is filled with zeros for them
+	Attributs:
+		-> directory : directory of the log, appended to if it already exists
+		-> schema : dict column name -> (dtype, shape of a row)
+		-> rows : number of rows written
+		-> totals : total time of each phase at the previous row
+		-> last : time of the previous row (time.perf_counter)
+		-> queue : rows waiting to be written
+		-> thread : writing thread
+	"""
+
+	def __init__(self, directory):
+		"""
+		StatsLog constructor
+		Parameters:
+			-> directory : directory of the log, created if needed
+		"""
+		self.directory = directory
+		os.makedirs(directory, exist_ok=True)
+		try:
+			columns = load(directory)
+		except FileNotFoundError:
+			columns = {}
+		self.schema = {name: (c.dtype.str, list(c.shape[1:])) for name, c in columns.items()}
+		self.rows = min((len(c) for c in columns.values()), default=0)
+		#A row partially written by an interrupted run is dropped
+		for name, c in columns.items():
+			os.truncate(self.path(name), c.nbytes)
+		self.totals = {}
+		self.last = time.perf_counter()
+		self.queue = queue.Queue()
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+
+	def path(self, name):
+		"""
+		Return the path of the file of the column name
+		"""
+		return os.path.join(self.directory, name + '.dat')
+
+	def submit(self, generation, game_score, scores, genome, instruments=None):
+		"""
+		Compute the statistics of a generation and write them in the background
+		Parameters:
+			-> generation : number of the generation
+			-> game_score : number of pipes passed by its leader
+			-> scores : fitness of each bird
+			-> genome : genome.Genome of the generation
+			-> instruments : instrumentation.Instrumentation of the loop, for the time of the phases
+		"""
+		now = time.perf_counter()
+		totals = instruments.totals() if instruments is not None else {}
+		phases = {name: total - self.totals.get(name, 0) for name, total in totals.items()}
+		self.totals, seconds, self.last = totals, now - self.last, now
+		self.queue.put(self.row(generation, game_score, np.asarray(scores, dtype=np.float64), genome.buffer, seconds,
+								phases))
+
+	def row(self, generation, game_score, scores, buffer, seconds, phases):
+		"""
+		Return the statistics of a generation: dict column name -> value
+		"""
+		row = {
+			'generation': np.int64(generation),
+			'game_score': np.int64(game_score),
+			'fitness': np.quantile(scores, QUANTILES),
+			'survival': survival_histogram(scores).astype(np.int64),
+			'diversity': np.float64(diversity(buffer)),
+			'seconds': np.float64(seconds),
+		}
+		row.update((f'phase_{name}', np.float64(t)) for name, t in phases.items())
+		return row
+
+	def append(self, row):
+		"""
+		Append a row to the files of the columns, adding the new columns to the schema
+		"""
+		new = [name for name in row if name not in self.schema]
+		for name in new:
+			value = np.asarray(row[name])
+			self.schema[name] = (value.dtype.str, list(value.shape))
+			with open(self.path(name), 'wb') as f:
+				f.write(np.zeros((self.rows, *value.shape), value.dtype).tobytes())
+		if new or self.rows == 0:
+			tmp = os.path.join(self.directory, SCHEMA + '.tmp')
+			with open(tmp, 'w') as f:
+				json.dump(self.schema, f, indent=1)
+			os.replace(tmp, os.path.join(self.directory, SCHEMA))
+		for name, (dtype, shape) in self.schema.items():
+			with open(self.path(name), 'ab') as f:
+				f.write(np.asarray(row.get(name, 0), dtype=dtype).reshape(shape).tobytes())
+		self.rows += 1
+
+	def run(self):
+		"""
+		Writing thread: write the rows until None is received
+		"""
+		while True:
+			row = self.queue.get()
+			if row is None:
+				break
+			self.append(row)
+
+	def close(self):
+		"""
+		Wait for the pending generations and stop the writing thread
+		"""
+		self.queue.put(None)
+		self.thread.join()
+
+
+def report(directory, path):
+	"""
+	Plot the curves of a log written by StatsLog to the image path
+	matplotlib is only imported here, the training never needs it
+	"""
+	import matplotlib
+	matplotlib.use('Agg')
+	import matplotlib.pyplot as plt
+
+	columns = load(directory)
+	generation = columns['generation']
+	figure, axes = plt.subplots(2, 2, figsize=(14, 9), sharex=True)
+
+	ax = axes[0, 0]
+	for q, curve in zip(QUANTILES, columns['fitness'].T):
+		ax.plot(generation, curve, label={0: 'min', 0.5: 'median', 1: 'max'}.get(q, f'p{int(q * 100)}'))
+	ax.set_yscale('symlog')
+	ax.set_ylabel('fitness (frames)')
+	ax.legend(loc='upper left')
+	score = ax.twinx()
+	score.plot(generation, columns['game_score'], color='black', alpha=0.3, linewidth=0.8)
+	score.set_ylabel('game score (pipes)')
+	ax.set_title('Fitness')
+
+	ax = axes[0, 1]
+	survival = columns['survival']
+	top = max(int(np.flatnonzero(survival.sum(axis=0))[-1]) + 1 if survival.any() else 1, 1)
+	ax.imshow(np.log1p(survival[:, :top].T), aspect='auto', origin='lower', interpolation='nearest',
+			extent=(generation[0] - 0.5, generation[-1] + 0.5, -0.5, top - 0.5) if len(generation) else None)
+	ax.set_ylabel('log2 of the fitness (frames)')
+	ax.set_title('Survival histogram (log of the number of birds)')
+
+	ax = axes[1, 0]
+	ax.plot(generation, columns['diversity'])
+	ax.set_xlabel('generation')
+	ax.set_ylabel('mean standard deviation of the parameters')
+	ax.set_title('Diversity')
+
+	ax = axes[1, 1]
+	#The phases may be nested (the simulation phases are part of the evaluation), so they are not stacked
+	ax.plot(generation, columns['seconds'], color='black', linewidth=0.8, label='generation')
+	for name in sorted(name for name in columns if name.startswith('phase_')):
+		ax.plot(generation, columns[name], linewidth=0.8, label=name[len('phase_'):])
+	ax.legend(loc='upper left', fontsize='small')
+	ax.set_xlabel('generation')
+	ax.set_ylabel('seconds')
+	ax.set_title('Wall-clock time')
+
+	figure.tight_layout()
+	figure.savefig(path)
+	plt.close(figure)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Report of the statistics of a training (see flappia.py --stats-dir)')
+	parser.add_argument('directory', help='directory of the statistics')
+	parser.add_argument('--output', default='report.png', help='image receiving the curves')
+	args = parser.parse_args()
+	report(args.directory, args.output)
+	print(f"{len(load(args.directory)['generation'])} generations plotted to {args.output}")
+
+
+if __name__ == "__main__":
+	main()
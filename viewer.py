@@ -0,0 +1,216 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from constants import SCREEN_SIZE, PIPE_WIDTH, PIPE_HEIGHT, BIRD_X, BIRD_RADIUS, NB_PIPES
+
+#Colors
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+GREEN = (0, 255, 0)
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+
+#Number of snapshots of the ring buffer
+NB_SLOTS = 4
+#Number of vertical bins of the density of the population
+NB_BINS = 50
+
+
+class SnapshotRing:
+	"""
+	Class SnapshotRing
+	Ring buffer of snapshots of a simulation in shared memory, one writer and one reader
+	Each slot is protected by a sequence number, odd while the slot is written
+	Attributs:
+		-> birds : number of birds drawn individually in a snapshot (see SnapshotWriter)
+		-> shm : shared memory
+		-> head : array [number of snapshots written]
+		-> slots : array (NB_SLOTS, slot size)
+	Layout of a slot: sequence, frame, game_score, generation, alive,
+	pipes_x (NB_PIPES), pipes_y (NB_PIPES), y of the drawn birds (birds, nan if dead), density (NB_BINS)
+	"""
+
+	def __init__(self, birds, name=None):
+		"""
+		SnapshotRing constructor
+		Parameters:
+			-> birds : number of birds drawn individually in a snapshot
+			-> name : name of an existing ring to attach, a new one is created if None
+		"""
+		self.birds = birds
+		size = 5 + 2 * NB_PIPES + birds + NB_BINS
+		nbytes = (1 + NB_SLOTS * size) * 8
+		self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=nbytes)
+		data = np.ndarray(1 + NB_SLOTS * size, dtype=np.float64, buffer=self.shm.buf)
+		if name is None:
+			data[:] = 0
+		self.head = data[:1]
+		self.slots = data[1:].reshape(NB_SLOTS, size)
+
+	def write(self, frame, game_score, generation, pipes_x, pipes_y, birds_y, density):
+		"""
+		Write a snapshot in the next slot
+		"""
+		slot = self.slots[int(self.head[0]) % NB_SLOTS]
+		slot[0] += 1
+		slot[1:5] = frame, game_score, generation, density.sum()
+		slot[5:5 + NB_PIPES] = pipes_x
+		slot[5 + NB_PIPES:5 + 2 * NB_PIPES] = pipes_y
+		slot[5 + 2 * NB_PIPES:5 + 2 * NB_PIPES + self.birds] = birds_y
+		slot[5 + 2 * NB_PIPES + self.birds:] = density
+		slot[0] += 1
+		self.head[0] += 1
+
+	def read(self):
+		"""
+		Return a copy of the last complete snapshot, None if there is none
+		"""
+		head = int(self.head[0])
+		for i in range(head - 1, max(head - NB_SLOTS, 0) - 1, -1):
+			slot = self.slots[i % NB_SLOTS]
+			sequence = slot[0]
+			copy = slot.copy()
+			if sequence == slot[0] and sequence % 2 == 0:
+				return copy
+		return None
+
+	def close(self, unlink=False):
+		"""
+		Detach the shared memory, and free it if unlink
+		"""
+		del self.head, self.slots
+		self.shm.close()
+		if unlink:
+			self.shm.unlink()
+
+
+class SnapshotWriter:
+	"""
+	Class SnapshotWriter
+	Observer of a simulation.Simulation writing snapshots in a SnapshotRing,
+	at most fps times per second so that the training is not slowed down
+	The birds drawn individually are the first living ones in the order of the population, not the best ones:
+	the living birds all have the same score until they die, and the GA elites, placed first,
+	start dead when their fitness is cached
+	Attributs:
+		-> ring : SnapshotRing
+		-> period : minimal time between two snapshots
+		-> last : time of the last snapshot
+		-> generation : number of the generation, set by the training loop
+	"""
+
+	def __init__(self, ring, fps=30):
+		"""
+		SnapshotWriter constructor
+		Parameters:
+			-> ring : SnapshotRing
+			-> fps : maximal number of snapshots per second
+		"""
+		self.ring = ring
+		self.period = 1 / fps
+		self.last = 0
+		self.generation = 0
+
+	def __call__(self, sim):
+		"""
+		Write a snapshot of sim if the last one is old enough
+		"""
+		now = time.perf_counter()
+		if now - self.last < self.period:
+			return
+		self.last = now
+		birds = self.ring.birds
+		alive = np.flatnonzero(sim.alive)
+		birds_y = np.full(birds, np.nan)
+		birds_y[:min(birds, len(alive))] = sim.y[alive[:birds]]
+		density = np.bincount(np.minimum((sim.y[alive] * NB_BINS / SCREEN_SIZE[1]).astype(np.int64), NB_BINS - 1),
+						minlength=NB_BINS)
+		self.ring.write(sim.frame, sim.game_score, self.generation, sim.pipes_x, sim.pipes_y, birds_y, density)
+
+
+def run_viewer(name, birds, fps):
+	"""
+	Viewer process: draw the last snapshot of the ring name fps times per second
+	The sampled birds are drawn in black, the density of the whole population in blue
+	Closing the window only stops the viewer
+	"""
+	import pygame
+
+	ring = SnapshotRing(birds, name)
+	pygame.init()
+	clock = pygame.time.Clock()
+	screen = pygame.display.set_mode(SCREEN_SIZE)
+	pygame.display.set_caption('FlappyIA - spectator')
+	font = pygame.font.Font(None, 36)
+	overlay = pygame.Surface(SCREEN_SIZE, pygame.SRCALPHA)
+	bin_height = SCREEN_SIZE[1] / NB_BINS
+	h = PIPE_HEIGHT / 2
+
+	running = True
+	while running:
+		for event in pygame.event.get():
+			if event.type == pygame.QUIT:
+				running = False
+		snapshot = ring.read()
+		if snapshot is None:
+			clock.tick(fps)
+			continue
+		frame, game_score, generation, alive = snapshot[1:5]
+		pipes_x = snapshot[5:5 + NB_PIPES]
+		pipes_y = snapshot[5 + NB_PIPES:5 + 2 * NB_PIPES]
+		birds_y = snapshot[5 + 2 * NB_PIPES:5 + 2 * NB_PIPES + birds]
+		density = snapshot[5 + 2 * NB_PIPES + birds:]
+
+		screen.fill(WHITE)
+		for x, y in zip(pipes_x, pipes_y):
+			pygame.draw.rect(screen, GREEN, (x, 0, PIPE_WIDTH, y-h))
+			pygame.draw.rect(screen, GREEN, (x, y+h, PIPE_WIDTH, SCREEN_SIZE[1]-y+h))
+		#Density of the population: one translucent band per vertical bin
+		overlay.fill((0, 0, 0, 0))
+		if alive > 0:
+			for i in np.flatnonzero(density):
+				alpha = int(40 + 200 * density[i] / density.max())
+				pygame.draw.rect(overlay, BLUE + (alpha,), (0, i * bin_height, BIRD_X + 2 * BIRD_RADIUS, bin_height))
+		screen.blit(overlay, (0, 0))
+		for y in birds_y[~np.isnan(birds_y)]:
+			pygame.draw.circle(screen, BLACK, (BIRD_X, int(y)), BIRD_RADIUS)
+
+		text = font.render(f"Gen {int(generation)}  Score : {int(game_score)}  Alive : {int(alive)}", True, RED)
+		screen.blit(text, (20, 20))
+		pygame.display.update()
+		clock.tick(fps)
+
+	pygame.quit()
+	ring.close()
+
+
+class Spectator:
+	"""
+	Class Spectator
+	Viewer process drawing the training at its own rate, fed by a SnapshotRing
+	Attributs:
+		-> ring : SnapshotRing shared with the viewer
+		-> writer : SnapshotWriter to add to the observers of the simulations
+		-> process : viewer process
+	"""
+
+	def __init__(self, birds=10, fps=30):
+		"""
+		Spectator constructor: create the ring and start the viewer
+		Parameters:
+			-> birds : number of living birds drawn individually (see SnapshotWriter)
+			-> fps : frame rate of the viewer and maximal rate of the snapshots
+		"""
+		self.ring = SnapshotRing(birds)
+		self.writer = SnapshotWriter(self.ring, fps)
+		self.process = multiprocessing.Process(target=run_viewer, args=(self.ring.shm.name, birds, fps), daemon=True)
+		self.process.start()
+
+	def close(self):
+		"""
+		Stop the viewer and free the ring
+		"""
+		self.process.terminate()
+		self.process.join()
+		self.ring.close(unlink=True)